@@ -5,7 +5,7 @@ See also: https://github.com/eth-cscs/pyfirecrest/pull/43
 """
 from __future__ import annotations
 
-from pathlib import PurePath
+from pathlib import PurePath, PureWindowsPath
 import typing as t  # import Iterable, Literal, TypedDict
 
 from firecrest import Firecrest
@@ -63,32 +63,84 @@ class RemotePath:
         self,
         client: Firecrest,
         machine: str,
-        path: PurePath,
+        path: PurePath | str,
         ftype: FType | t.Literal[False] | None,
         size: int | t.Literal[False] | None,
+        *,
+        listings: dict[str, list[LsFile]] | None = None,
+        path_cls: type[PurePath] | None = None,
+        name: str | None = None,
     ):
+        """Initialize the path.
+
+        :param path: the path, or its string (then ``path_cls`` is required),
+            in which case its `PurePath` is only created if requested
+        :param listings: a cache of directory listings, shared with derived paths,
+            so that repeated walks (e.g. for multiple globs) only list each directory once.
+            Only use this when the remote directory tree is not changing.
+        :param path_cls: the `PurePath` class, for a string ``path``
+        :param name: the name of the path, if already known
+        """
         self._client = client
         self._machine = machine
-        self._path = path
+        self._path: PurePath | None
+        if isinstance(path, str):
+            if path_cls is None:
+                raise TypeError("path_cls is required for a string path")
+            self._path = None
+            self._path_cls = path_cls
+            self._path_str = path
+        else:
+            self._path = path
+            self._path_cls = type(path)
+            self._path_str = path.__fspath__()
+        self._name = name
         self._ftype = ftype  # note does not follow symlinks, False if it doesn't exist, None if unknown
         self._size = size
+        self._listings = listings
+
+    def _child(
+        self: RPathType,
+        name: str,
+        ftype: FType | t.Literal[False],
+        size: int | t.Literal[False],
+    ) -> RPathType:
+        """Create a child of this path, without re-parsing the full path.
+
+        The `PurePath` of the child is only created if requested.
+        """
+        sep = "\\" if issubclass(self._path_cls, PureWindowsPath) else "/"
+        return self.__class__(
+            self._client,
+            self._machine,
+            self._path_str.rstrip(sep) + sep + name,
+            ftype,
+            size,
+            listings=self._listings,
+            path_cls=self._path_cls,
+            name=name,
+        )
 
     def __repr__(self) -> str:
-        return f"{self.__class__.__name__}({self._machine}@{self._path})"
+        return f"{self.__class__.__name__}({self._machine}@{self._path_str})"
 
     @property
     def name(self) -> str:
         """Return the name of this path."""
-        return self._path.name
+        if self._name is None:
+            self._name = self.pure_path.name
+        return self._name
 
     @property
     def path(self) -> str:
         """Return the full path as a string."""
-        return self._path.__fspath__()
+        return self._path_str
 
     @property
     def pure_path(self) -> PurePath:
         """Return the path as a PurePath."""
+        if self._path is None:
+            self._path = self._path_cls(self._path_str)
         return self._path
 
     @property
@@ -98,7 +150,7 @@ class RemotePath:
             return None
         if self._ftype is None:
             try:
-                stat: StatFile = self._client.stat(self._machine, str(self._path))
+                stat: StatFile = self._client.stat(self._machine, self._path_str)
             except HeaderException as exc:
                 for header in exc.responses[-1].headers:
                     if header == "X-Not-Found":
@@ -143,24 +195,54 @@ class RemotePath:
 
     def iterdir(self: RPathType) -> t.Iterable[RPathType]:
         """Iterate over the contents of this directory."""
-        child: LsFile
-        for child in self._client.list_files(
-            self._machine, str(self._path), show_hidden=True
-        ):
-            yield self.__class__(
-                self._client,
-                self._machine,
-                self._path / child["name"],
-                child["type"],
-                int(child["size"]),
+        if self._listings is not None and self._path_str in self._listings:
+            children = self._listings[self._path_str]
+        else:
+            children = self._client.list_files(
+                self._machine, self._path_str, show_hidden=True
             )
+            if self._listings is not None:
+                self._listings[self._path_str] = children
+        child: LsFile
+        for child in children:
+            yield self._child(child["name"], child["type"], int(child["size"]))
 
     def joinpath(self: RPathType, *parts: str) -> RPathType:
-        """Join this path with the given parts."""
+        """Join this path with the given parts.
+
+        If directory listings are cached, single names are resolved from the listing
+        of their parent directory, so that their type and size are known
+        without a separate stat request per path.
+        """
+        if self._listings is not None and parts:
+            sep = "\\" if issubclass(self._path_cls, PureWindowsPath) else "/"
+            if all(part not in ("", ".", "..") and sep not in part for part in parts):
+                path = self
+                for part in parts:
+                    path = path._join_listed(part)
+                return path
+        return self._join_unresolved(*parts)
+
+    def _join_unresolved(self: RPathType, *parts: str) -> RPathType:
+        """Join this path with the given parts, with an unknown type and size."""
         return self.__class__(
             self._client,
             self._machine,
-            self._path.joinpath(*parts),
+            self.pure_path.joinpath(*parts),
             None,
             None,
+            listings=self._listings,
         )
+
+    def _join_listed(self: RPathType, name: str) -> RPathType:
+        """Join this path with a single name, resolved from the directory listing."""
+        if self._ftype is None or self._ftype == "l":
+            # the type is unknown, or the link may point to a directory
+            return self._join_unresolved(name)
+        if self._ftype != "d":
+            # a missing path or non-directory has no children
+            return self._child(name, False, False)
+        for child in self.iterdir():
+            if child.name == name:
+                return child
+        return self._child(name, False, False)
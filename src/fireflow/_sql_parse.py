@@ -5,18 +5,22 @@ https://github.com/pyparsing/pyparsing/blob/14def7d7f454bfe891589a67801854b12e0b
 Taken from SQLite's SELECT statement
 definition at https://www.sqlite.org/lang_select.html
 """
+
 from functools import lru_cache
+import operator
+import re
 import typing as t
 
-import pyparsing as pp
+from sqlalchemy import and_, not_, or_
+from sqlalchemy.ext.associationproxy import ColumnAssociationProxyInstance
+from sqlalchemy.orm import InstrumentedAttribute
 
 if t.TYPE_CHECKING:
+    import pyparsing as pp
     from sqlalchemy import ColumnElement
 
     from .orm import Base
 
-pp.ParserElement.enablePackrat()
-
 KWD_TYPE = t.Literal[
     "UNION",
     "ALL",
@@ -73,24 +77,73 @@ KWD_TYPE = t.Literal[
     "FALSE",
 ]
 
+# keywords ordered by how commonly they occur, so that regex alternation
+# tries the most likely ones first (KWD_TYPE remains the canonical set)
+_COMMON_KEYWORDS = (
+    "AND",
+    "OR",
+    "NOT",
+    "IN",
+    "IS",
+    "LIKE",
+    "NULL",
+    "TRUE",
+    "FALSE",
+    "BETWEEN",
+    "SELECT",
+    "FROM",
+    "WHERE",
+    "AS",
+)
+_KEYWORDS_BY_FREQ = _COMMON_KEYWORDS + tuple(
+    k for k in t.get_args(KWD_TYPE) if k not in _COMMON_KEYWORDS
+)
+
+# matches any keyword, case-insensitively, as a whole word
+_KEYWORD_PATTERN = r"(?i:" + "|".join(_KEYWORDS_BY_FREQ) + r")\b"
+
+
+# matches any literal value, in a single regex rather than one element per kind
+_LITERAL_RE = re.compile(
+    r"(?P<real>[+-]?(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?\d+[eE][+-]?\d+)"
+    r"|(?P<int>[+-]?\d+)"
+    r"|'(?P<str>(?:[^']|'')*)'"
+    r"|(?P<blob>[xX]'[0-9A-Fa-f]+')"
+    r"|(?P<kw>(?i:TRUE|FALSE|NULL|CURRENT_TIMESTAMP|CURRENT_TIME|CURRENT_DATE)\b)"
+)
+
+
+_KWD_CACHE: t.Dict[str, "pp.CaselessKeyword"] = {}
+
+
+def _kwd(k: KWD_TYPE) -> "pp.CaselessKeyword":
+    """Return the (shared) element matching a keyword."""
+    import pyparsing as pp
+
+    element = _KWD_CACHE.get(k)
+    if element is None:
+        element = _KWD_CACHE[k] = pp.CaselessKeyword(k)
+    return element
+
 
 @lru_cache
-def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
+def _get_grammar() -> "pp.ParserElement":
     """Return the grammar for a SELECT statement"""
+    # pyparsing is only imported here, since filter strings do not need it
+    import pyparsing as pp
+
     LPAR, RPAR, COMMA = map(pp.Suppress, "(),")
     DOT, STAR = map(pp.Literal, ".*")
     select_stmt = pp.Forward().setName("select statement")
 
-    # keywords
-    @lru_cache
-    def kwd(k: KWD_TYPE) -> pp.CaselessKeyword:
-        return pp.CaselessKeyword(k)
+    any_keyword = pp.Regex(_KEYWORD_PATTERN)
 
-    any_keyword = pp.MatchFirst([kwd(k) for k in t.get_args(KWD_TYPE)])
+    def downcase(toks: pp.ParseResults) -> str:
+        return str(toks[0]).lower()
 
     quoted_identifier = pp.QuotedString('"', escQuote='""')
     identifier = (~any_keyword + pp.Word(pp.alphas, pp.alphanums + "_")).setParseAction(
-        pp.pyparsing_common.downcaseTokens
+        downcase
     ) | quoted_identifier
     collation_name = identifier.copy()
     column_name = identifier.copy()
@@ -107,28 +160,26 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
     # expression
     expr = pp.Forward().setName("expression")
 
-    numeric_literal = pp.pyparsing_common.number
-    string_literal = pp.QuotedString("'", escQuote="''")
-    blob_literal = pp.Regex(r"[xX]'[0-9A-Fa-f]+'")
-    literal_value = (
-        numeric_literal
-        | string_literal
-        | blob_literal
-        | kwd("TRUE")
-        | kwd("FALSE")
-        | kwd("NULL")
-        | kwd("CURRENT_TIME")
-        | kwd("CURRENT_DATE")
-        | kwd("CURRENT_TIMESTAMP")
-    )
+    def to_literal(toks: pp.ParseResults) -> t.Any:
+        if toks["str"] is not None:
+            return toks["str"].replace("''", "'")
+        if toks["int"] is not None:
+            return int(toks["int"])
+        if toks["real"] is not None:
+            return float(toks["real"])
+        if toks["kw"] is not None:
+            return toks["kw"].upper()
+        return toks[0]
+
+    literal_value = pp.Regex(_LITERAL_RE).setParseAction(to_literal)
     bind_parameter = pp.Word("?", pp.nums) | pp.Combine(
         pp.oneOf(": @ $") + parameter_name
     )
     type_name = pp.oneOf("TEXT REAL INTEGER BLOB NULL")
 
     expr_term = (
-        kwd("CAST") + LPAR + expr + kwd("AS") + type_name + RPAR
-        | kwd("EXISTS") + LPAR + select_stmt + RPAR
+        _kwd("CAST") + LPAR + expr + _kwd("AS") + type_name + RPAR
+        | _kwd("EXISTS") + LPAR + select_stmt + RPAR
         | function_name.setName("function_name")
         + LPAR
         + pp.Optional(STAR | pp.delimitedList(expr))
@@ -142,20 +193,24 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
         | pp.Group(identifier("col"))
     )
 
-    NOT_NULL = pp.Group(kwd("NOT") + kwd("NULL"))
-    NOT_BETWEEN = pp.Group(kwd("NOT") + kwd("BETWEEN"))
-    NOT_IN = pp.Group(kwd("NOT") + kwd("IN"))
-    NOT_LIKE = pp.Group(kwd("NOT") + kwd("LIKE"))
-    NOT_MATCH = pp.Group(kwd("NOT") + kwd("MATCH"))
-    NOT_GLOB = pp.Group(kwd("NOT") + kwd("GLOB"))
-    NOT_REGEXP = pp.Group(kwd("NOT") + kwd("REGEXP"))
+    def negated(k: KWD_TYPE) -> pp.ParserElement:
+        # matched as a single "NOT <k>" string
+        return (_kwd("NOT") + _kwd(k)).setParseAction(pp.replaceWith(f"NOT {k}"))
+
+    NOT_NULL = negated("NULL")
+    NOT_BETWEEN = negated("BETWEEN")
+    NOT_IN = negated("IN")
+    NOT_LIKE = negated("LIKE")
+    NOT_MATCH = negated("MATCH")
+    NOT_GLOB = negated("GLOB")
+    NOT_REGEXP = negated("REGEXP")
 
     UNARY, BINARY, TERNARY = 1, 2, 3
     expr << pp.infixNotation(  # type: ignore[operator]
         expr_term,
         [
-            (pp.oneOf("- + ~") | kwd("NOT"), UNARY, pp.opAssoc.RIGHT),
-            (kwd("ISNULL") | kwd("NOTNULL") | NOT_NULL, UNARY, pp.opAssoc.LEFT),
+            (pp.oneOf("- + ~") | _kwd("NOT"), UNARY, pp.opAssoc.RIGHT),
+            (_kwd("ISNULL") | _kwd("NOTNULL") | NOT_NULL, UNARY, pp.opAssoc.LEFT),
             ("||", BINARY, pp.opAssoc.LEFT),
             (pp.oneOf("* / %"), BINARY, pp.opAssoc.LEFT),
             (pp.oneOf("+ -"), BINARY, pp.opAssoc.LEFT),
@@ -163,12 +218,12 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
             (pp.oneOf("< <= > >="), BINARY, pp.opAssoc.LEFT),
             (
                 pp.oneOf("= == != <>")
-                | kwd("IS")
-                | kwd("IN")
-                | kwd("LIKE")
-                | kwd("GLOB")
-                | kwd("MATCH")
-                | kwd("REGEXP")
+                | _kwd("IS")
+                | _kwd("IN")
+                | _kwd("LIKE")
+                | _kwd("GLOB")
+                | _kwd("MATCH")
+                | _kwd("REGEXP")
                 | NOT_IN
                 | NOT_LIKE
                 | NOT_GLOB
@@ -177,51 +232,47 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
                 BINARY,
                 pp.opAssoc.LEFT,
             ),
-            ((kwd("BETWEEN") | NOT_BETWEEN, kwd("AND")), TERNARY, pp.opAssoc.LEFT),
+            ((_kwd("BETWEEN") | NOT_BETWEEN, _kwd("AND")), TERNARY, pp.opAssoc.LEFT),
             (
-                (kwd("IN") | NOT_IN)
+                (_kwd("IN") | NOT_IN)
                 + LPAR
                 + pp.Group(select_stmt | pp.delimitedList(expr))
                 + RPAR,
                 UNARY,
                 pp.opAssoc.LEFT,
             ),
-            (kwd("AND"), BINARY, pp.opAssoc.LEFT),
-            (kwd("OR"), BINARY, pp.opAssoc.LEFT),
+            (_kwd("AND"), BINARY, pp.opAssoc.LEFT),
+            (_kwd("OR"), BINARY, pp.opAssoc.LEFT),
         ],
     )
 
-    if expr_only:
-        expr.ignore(comment)
-        return expr("expr")
-
     compound_operator = (
-        kwd("UNION") + pp.Optional(kwd("ALL")) | kwd("INTERSECT") | kwd("EXCEPT")
+        _kwd("UNION") + pp.Optional(_kwd("ALL")) | _kwd("INTERSECT") | _kwd("EXCEPT")
     )
 
     ordering_term = pp.Group(
         expr("order_key")
-        + pp.Optional(kwd("COLLATE") + collation_name("collate"))
-        + pp.Optional(kwd("ASC") | kwd("DESC"))("direction")
+        + pp.Optional(_kwd("COLLATE") + collation_name("collate"))
+        + pp.Optional(_kwd("ASC") | _kwd("DESC"))("direction")
     )
 
     join_constraint = pp.Group(
         pp.Optional(
-            kwd("ON") + expr
-            | kwd("USING") + LPAR + pp.Group(pp.delimitedList(column_name)) + RPAR
+            _kwd("ON") + expr
+            | _kwd("USING") + LPAR + pp.Group(pp.delimitedList(column_name)) + RPAR
         )
     )
 
     join_op = COMMA | pp.Group(
-        pp.Optional(kwd("NATURAL"))
+        pp.Optional(_kwd("NATURAL"))
         + pp.Optional(
-            kwd("INNER")
-            | kwd("CROSS")
-            | kwd("LEFT") + kwd("OUTER")
-            | kwd("LEFT")
-            | kwd("OUTER")
+            _kwd("INNER")
+            | _kwd("CROSS")
+            | _kwd("LEFT") + _kwd("OUTER")
+            | _kwd("LEFT")
+            | _kwd("OUTER")
         )
-        + kwd("JOIN")
+        + _kwd("JOIN")
     )
 
     join_source = pp.Forward()
@@ -230,16 +281,16 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
             database_name("database") + DOT + table_name("table*")
             | table_name("table*")
         )
-        + pp.Optional(pp.Optional(kwd("AS")) + table_alias("table_alias*"))
+        + pp.Optional(pp.Optional(_kwd("AS")) + table_alias("table_alias*"))
         + pp.Optional(
-            kwd("INDEXED") + kwd("BY") + index_name("name")
-            | kwd("NOT") + kwd("INDEXED")
+            _kwd("INDEXED") + _kwd("BY") + index_name("name")
+            | _kwd("NOT") + _kwd("INDEXED")
         )("index")
         | (
             LPAR
             + select_stmt
             + RPAR
-            + pp.Optional(pp.Optional(kwd("AS")) + table_alias)
+            + pp.Optional(pp.Optional(_kwd("AS")) + table_alias)
         )
         | (LPAR + join_source + RPAR)
     )
@@ -254,20 +305,20 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
     result_column = pp.Group(
         STAR("col")
         | table_name("col_table") + DOT + STAR("col")
-        | expr("col") + pp.Optional(pp.Optional(kwd("AS")) + column_alias("alias"))
+        | expr("col") + pp.Optional(pp.Optional(_kwd("AS")) + column_alias("alias"))
     )
 
     select_core = (
-        kwd("SELECT")
-        + pp.Optional(kwd("DISTINCT") | kwd("ALL"))
+        _kwd("SELECT")
+        + pp.Optional(_kwd("DISTINCT") | _kwd("ALL"))
         + pp.Group(pp.delimitedList(result_column))("columns")
-        + pp.Optional(kwd("FROM") + join_source("from*"))
-        + pp.Optional(kwd("WHERE") + expr("where_expr"))
+        + pp.Optional(_kwd("FROM") + join_source("from*"))
+        + pp.Optional(_kwd("WHERE") + expr("where_expr"))
         + pp.Optional(
-            kwd("GROUP")
-            + kwd("BY")
+            _kwd("GROUP")
+            + _kwd("BY")
             + pp.Group(pp.delimitedList(ordering_term))("group_by_terms")
-            + pp.Optional(kwd("HAVING") + expr("having_expr"))
+            + pp.Optional(_kwd("HAVING") + expr("having_expr"))
         )
     )
 
@@ -275,14 +326,14 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
         select_core
         + pp.ZeroOrMore(compound_operator + select_core)
         + pp.Optional(
-            kwd("ORDER")
-            + kwd("BY")
+            _kwd("ORDER")
+            + _kwd("BY")
             + pp.Group(pp.delimitedList(ordering_term))("order_by_terms")
         )
         + pp.Optional(
-            kwd("LIMIT")
+            _kwd("LIMIT")
             + (
-                pp.Group(expr + kwd("OFFSET") + expr)
+                pp.Group(expr + _kwd("OFFSET") + expr)
                 | pp.Group(expr + COMMA + expr)
                 | expr
             )("limit")
@@ -294,14 +345,14 @@ def _get_grammar(expr_only: bool = False) -> pp.ParserElement:
     return select_stmt
 
 
-def get_grammar_select() -> pp.ParserElement:
-    """Return the grammar for SELECT statements."""
-    return _get_grammar()
+def get_grammar_select() -> "pp.ParserElement":
+    """Return the grammar for SELECT statements.
 
-
-def get_grammar_expr() -> pp.ParserElement:
-    """Return the grammar for expressions."""
-    return _get_grammar(expr_only=True)
+    This is built (once) on first use, rather than at import,
+    since it is not needed for filter strings,
+    whose lexer and parser tables are all created at import.
+    """
+    return _get_grammar()
 
 
 class FilterStringError(NotImplementedError):
@@ -316,135 +367,382 @@ class FilterStringError(NotImplementedError):
         self.detail = detail
 
 
+# filter expressions are parsed with a precedence climbing (Pratt) parser,
+# over a flat token stream lexed by a single regex, rather than with the pyparsing `infixNotation`,
+# which is very slow for this many precedence levels.
+
+Token = t.Tuple[str, t.Any, int]
+"""A lexed token, as ``(kind, value, position)``."""
+
+
+_TOKEN_RE = re.compile(
+    r"(?P<WS>\s+|--[^\n]*)"
+    r"|(?P<NUM>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<STR>'(?:[^']|'')*')"
+    r"|(?P<QID>\"(?:[^\"]|\"\")*\")"
+    r"|(?P<KW>" + _KEYWORD_PATTERN + ")"
+    r"|(?P<ID>[A-Za-z][A-Za-z0-9_]*)"
+    r"|(?P<OP>\|\||<<|>>|<=|>=|==|!=|<>|[<>=+\-*/%&|~])"
+    r"|(?P<PUNCT>[(),.])"
+    r"|(?P<ERROR>.)",
+    re.DOTALL,
+)
+
+
+def _tokenize(filter_string: str) -> t.List[Token]:
+    """Lex a filter string to a list of tokens."""
+    tokens: t.List[Token] = []
+    for match in _TOKEN_RE.finditer(filter_string):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "WS":
+            continue
+        if kind == "NUM":
+            value: t.Any = float(text) if any(c in text for c in ".eE") else int(text)
+        elif kind == "STR":
+            value = text[1:-1].replace("''", "'")
+        elif kind == "QID":
+            kind, value = "ID", text[1:-1].replace('""', '"')
+        elif kind == "KW":
+            value = text.upper()
+        elif kind == "ID":
+            value = text.lower()
+        elif kind == "ERROR":
+            raise FilterStringError(
+                filter_string,
+                detail=f"Invalid SQL at column {match.start() + 1} "
+                f"(Unexpected character {text!r})",
+            )
+        else:
+            value = text
+        tokens.append((kind, value, match.start()))  # type: ignore[arg-type]
+    return tokens
+
+
+# binding powers of the infix operators, from SQLite's operator precedence;
+# all are left associative
+_BINDING_POWER: t.Dict[str, int] = {
+    "OR": 1,
+    "AND": 2,
+    "==": 4,
+    "!=": 4,
+    "IS": 4,
+    "IS NOT": 4,
+    "IN": 4,
+    "NOT IN": 4,
+    "LIKE": 4,
+    "NOT LIKE": 4,
+    "GLOB": 4,
+    "NOT GLOB": 4,
+    "MATCH": 4,
+    "NOT MATCH": 4,
+    "REGEXP": 4,
+    "NOT REGEXP": 4,
+    "<": 5,
+    "<=": 5,
+    ">": 5,
+    ">=": 5,
+    "&": 6,
+    "|": 6,
+    "<<": 6,
+    ">>": 6,
+    "+": 7,
+    "-": 7,
+    "*": 8,
+    "/": 8,
+    "%": 8,
+    "||": 9,
+}
+_NOT_BINDING_POWER = 3
+# two keyword operators, mapped from their first then second keyword
+_NEGATED_OPS: t.Dict[str, t.Dict[str, str]] = {
+    "IS": {"NOT": "IS NOT"},
+    "NOT": {k: f"NOT {k}" for k in ("IN", "LIKE", "GLOB", "MATCH", "REGEXP")},
+}
+_UNARY_BINDING_POWER = 10
+_OP_ALIASES = {"=": "==", "<>": "!="}
+_LITERAL_KEYWORDS = {"TRUE": True, "FALSE": False, "NULL": None}
+
+
+class _ExprParser:
+    """A precedence climbing parser for filter expressions.
+
+    The AST is made of plain tuples:
+    columns are ``("COLUMN", table, name)``,
+    operators are ``(op, lhs, rhs)`` or ``(op, operand)``,
+    ``IN`` values are tuples of items, and literals are Python values,
+    so the whole AST is immutable and hashable.
+    """
+
+    __slots__ = ("filter_string", "index", "tokens")
+
+    def __init__(self, filter_string: str, tokens: t.List[Token]) -> None:
+        self.filter_string = filter_string
+        self.tokens = tokens
+        self.index = 0
+
+    def error(self, msg: str) -> FilterStringError:
+        token = self.peek()
+        position = len(self.filter_string) if token is None else token[2]
+        return FilterStringError(
+            self.filter_string,
+            detail=f"Invalid SQL at column {position + 1} ({msg})",
+        )
+
+    def peek(self, offset: int = 0) -> t.Optional[Token]:
+        index = self.index + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise self.error("Unexpected end of expression")
+        self.index += 1
+        return token
+
+    def at(self, kind: str, value: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token[:2] == (kind, value)
+
+    def expect(self, kind: str, value: str) -> None:
+        if not self.at(kind, value):
+            raise self.error(f"Expected {value!r}")
+        self.index += 1
+
+    def parse(self) -> t.Any:
+        """Parse the full token stream."""
+        if not self.tokens:
+            return None
+        node = self.parse_expr(0)
+        if self.index < len(self.tokens):
+            raise self.error(f"Unexpected {self.tokens[self.index][1]!r}")
+        return node
+
+    def parse_expr(self, min_bp: int) -> t.Any:
+        """Parse an expression, binding operators with power greater than ``min_bp``."""
+        lhs = self.parse_prefix()
+        while True:
+            op, width = self.peek_infix()
+            if op is None:
+                return lhs
+            bp = _BINDING_POWER[op]
+            if bp <= min_bp:
+                return lhs
+            self.index += width
+            rhs = self.parse_list() if op in ("IN", "NOT IN") else self.parse_expr(bp)
+            lhs = (op, lhs, rhs)
+
+    def peek_infix(self) -> t.Tuple[t.Optional[str], int]:
+        """Return the infix operator at the current position, and its token count."""
+        token = self.peek()
+        if token is None:
+            return None, 0
+        kind, value, _ = token
+        if kind == "OP":
+            value = _OP_ALIASES.get(value, value)
+            return (value, 1) if value in _BINDING_POWER else (None, 0)
+        if kind != "KW":
+            return None, 0
+        following = self.peek(1)
+        if value in _NEGATED_OPS and following is not None and following[0] == "KW":
+            negated = _NEGATED_OPS[value].get(following[1])
+            if negated is not None:
+                return negated, 2
+        return (value, 1) if value in _BINDING_POWER else (None, 0)
+
+    def parse_prefix(self) -> t.Any:
+        """Parse an operand, including any prefix operators."""
+        kind, value, _ = self.next()
+        if kind in ("NUM", "STR"):
+            return value
+        if kind == "ID":
+            if self.at("PUNCT", "."):
+                self.index += 1
+                kind, name, _ = self.next()
+                if kind != "ID":
+                    self.index -= 1
+                    raise self.error("Expected a column name")
+                return ("COLUMN", value, name)
+            return ("COLUMN", None, value)
+        if kind == "KW" and value in _LITERAL_KEYWORDS:
+            return _LITERAL_KEYWORDS[value]
+        if kind == "KW" and value == "NOT":
+            return ("NOT", self.parse_expr(_NOT_BINDING_POWER))
+        if kind == "OP" and value in ("-", "+", "~"):
+            operand = self.parse_expr(_UNARY_BINDING_POWER)
+            if value != "~" and isinstance(operand, (int, float)):
+                return -operand if value == "-" else operand
+            return (value, operand)
+        if (kind, value) == ("PUNCT", "("):
+            node = self.parse_expr(0)
+            self.expect("PUNCT", ")")
+            return node
+        self.index -= 1
+        raise self.error(f"Unexpected {value!r}")
+
+    def parse_list(self) -> t.Tuple[t.Any, ...]:
+        """Parse a parenthesised, comma delimited list of expressions."""
+        self.expect("PUNCT", "(")
+        items = [self.parse_expr(0)]
+        while self.at("PUNCT", ","):
+            self.index += 1
+            items.append(self.parse_expr(0))
+        self.expect("PUNCT", ")")
+        return tuple(items)
+
+
+_COMPARATORS: t.Dict[str, t.Callable[[t.Any, t.Any], "ColumnElement[bool]"]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "IS": lambda col, value: col.is_(value),
+    "IS NOT": lambda col, value: col.is_not(value),
+    "IN": lambda col, value: col.in_(value),
+    "NOT IN": lambda col, value: ~col.in_(value),
+    "LIKE": lambda col, value: col.like(value),
+    "NOT LIKE": lambda col, value: ~col.like(value),
+}
+"""Mapping of comparison operators to the SQLAlchemy filter they create."""
+
+
+_SIMPLE_COMPARISON_RE = re.compile(
+    r"\s*(?!" + _KEYWORD_PATTERN + r")(?P<col>[A-Za-z][A-Za-z0-9_]*)"
+    r"\s*(?P<op>==|!=|<>|<=|>=|<|>|=)\s*"
+    r"(?:'(?P<str>(?:[^']|'')*)'|(?P<num>-?\d+(?:\.\d+)?)|(?P<lit>(?i:TRUE|FALSE|NULL))\b)"
+    r"\s*"
+)
+"""Matches filters of the form ``column <op> literal``,
+which can be converted without the full lexer and parser."""
+
+_BARE_COLUMN_RE = re.compile(
+    r"\s*(?!" + _KEYWORD_PATTERN + r")[A-Za-z][A-Za-z0-9_]*\s*"
+)
+"""Matches filters that are only a column name, which apply no filter."""
+
+
+@lru_cache(maxsize=1024)
+def _parse_filter_ast(filter_string: str) -> t.Any:
+    """Parse a filter string to its expression AST.
+
+    The result is cached, since the same filter strings are often reused;
+    it is made only of tuples and literals, so can be safely shared.
+    """
+    match = _SIMPLE_COMPARISON_RE.fullmatch(filter_string)
+    if match is not None:
+        # fast path for the common "column <op> literal" filters
+        if match["str"] is not None:
+            value: t.Any = match["str"].replace("''", "'")
+        elif match["num"] is not None:
+            text = match["num"]
+            value = float(text) if "." in text else int(text)
+        else:
+            value = _LITERAL_KEYWORDS[match["lit"].upper()]
+        op = match["op"]
+        return (_OP_ALIASES.get(op, op), ("COLUMN", None, match["col"].lower()), value)
+    return _ExprParser(filter_string, _tokenize(filter_string)).parse()
+
+
+@lru_cache(maxsize=4096)
+def _resolve_column(
+    obj_cls: t.Type["Base"], col_str: str
+) -> t.Union["InstrumentedAttribute[t.Any]", "ColumnAssociationProxyInstance[t.Any]"]:
+    """Return the column attribute of an ORM class, to filter on.
+
+    The result is cached per class and name.
+
+    :raises AttributeError: if the attribute is not found.
+    :raises TypeError: if the attribute is not a column.
+    """
+    col = getattr(obj_cls, col_str, None)
+    if col is None:
+        raise AttributeError(col_str)
+    if not isinstance(col, (InstrumentedAttribute, ColumnAssociationProxyInstance)):
+        raise TypeError(str(col))
+    return col
+
+
 def filter_from_string(
     obj_cls: t.Type["Base"], filter_string: str
 ) -> t.Union[None, "ColumnElement[bool]"]:
     """Create a filter from a string."""
-    from sqlalchemy import and_, or_
-    from sqlalchemy.ext.associationproxy import ColumnAssociationProxyInstance
-    from sqlalchemy.orm import InstrumentedAttribute
-
     if not isinstance(filter_string, str):
         raise TypeError(f"Expected a string, got {type(filter_string)}")
-    if not filter_string:
-        return None
-    try:
-        parsed = (
-            get_grammar_expr()
-            .parse_string(filter_string, parse_all=True)
-            .as_dict()["expr"]
-        )
-    except pp.ParseException as exc:
-        raise FilterStringError(
-            filter_string,
-            detail=f"Invalid SQL at column {exc.column} ({exc.msg}): {exc.line!r}",
-        ) from exc
-
-    if isinstance(parsed, dict):
-        # e.g. "a" => {"col": "a"}
+    if not filter_string or _BARE_COLUMN_RE.fullmatch(filter_string):
         return None
-    elif not isinstance(parsed, list):
-        raise FilterStringError(filter_string, detail=f"Expected a list: {parsed}")
-    len_parsed = len(parsed)
-    if len_parsed == 0:
+    parsed = _parse_filter_ast(filter_string)
+
+    if parsed is None or (isinstance(parsed, tuple) and parsed[0] == "COLUMN"):
+        # e.g. "a" => ("COLUMN", None, "a")
         return None
-    if isinstance(parsed[0], dict) and len(parsed) == 3:
-        # e.g. "a == 1" => [{'col': 'a'}, '==', 1]
-        parsed = [parsed]
-        len_parsed = 1
-    index = 0
-    last_op = None
-    comp = None
-    while index < len_parsed:
-        if not (isinstance(parsed[index], list) and len(parsed[index]) == 3):
+
+    def _build(node: t.Any) -> "ColumnElement[bool]":
+        if not isinstance(node, tuple) or node[0] == "COLUMN":
             raise FilterStringError(
-                filter_string, detail=f"Expected a list of length 3: {parsed[index]}"
+                filter_string, detail=f"Expected a comparison: {node}"
             )
-        assign, comparator, value = parsed[index]
-        if not isinstance(assign, dict):
-            raise FilterStringError(filter_string, detail=f"Expected a dict: {assign}")
-        col_str = assign.get("col")
-        if col_str is None:
+        if node[0] == "NOT" and len(node) == 2:
+            return not_(_build(node[1]))
+        if len(node) != 3:
+            raise FilterStringError(filter_string, user=f"Unknown operator: {node[0]}")
+        comparator, assign, value = node
+        if comparator in ("AND", "OR"):
+            # flatten runs of the same connective into a single clause
+            parts = []
+            stack = [value, assign]
+            while stack:
+                part = stack.pop()
+                if isinstance(part, tuple) and part[0] == comparator:
+                    stack.extend((part[2], part[1]))
+                else:
+                    parts.append(_build(part))
+            return and_(*parts) if comparator == "AND" else or_(*parts)
+        if not (isinstance(assign, tuple) and assign[0] == "COLUMN"):
             raise FilterStringError(
                 filter_string,
                 user="Left comparators must be columns",
-                detail=f"Expected a 'col' key: {assign}",
+                detail=f"Expected a column: {assign}",
             )
-        tbl_str = assign.get("col_tab")
+        _, tbl_str, col_str = assign
         if tbl_str is not None:
             # TODO how to do join filters? like "status.state == 'created'" for calcjob
             # see: https://docs.sqlalchemy.org/en/20/orm/queryguide/select.html#orm-queryguide-relationship-operators
             raise FilterStringError(filter_string, user=f"Unknown table: {tbl_str}")
-        tbl_obj = obj_cls
-        col = getattr(tbl_obj, col_str, None)
-        if col is None:
+        try:
+            col = _resolve_column(obj_cls, col_str)
+        except AttributeError:
             raise FilterStringError(
                 filter_string,
                 user=f"Unknown column {col_str!r}",
                 detail=f"Attribute {col_str!r} not found",
-            )
-        if not isinstance(col, (InstrumentedAttribute, ColumnAssociationProxyInstance)):
+            ) from None
+        except TypeError as exc:
             raise FilterStringError(
                 filter_string,
-                user=f"Unknown column {col_str!r} {col}",
+                user=f"Unknown column {col_str!r} {exc}",
                 detail=f"Attribute {col_str!r} is not a InstrumentedAttribute",
-            )
-        if isinstance(value, dict):
-            if "col" in value:
+            ) from None
+        for item in value if comparator in ("IN", "NOT IN") else (value,):
+            if not isinstance(item, tuple):
+                continue
+            if item[0] == "COLUMN":
                 raise FilterStringError(
                     filter_string,
                     user="unknown right comparison",
-                    detail=f"Got a column for right comparison: {value}",
+                    detail=f"Got a column for right comparison: {item}",
                 )
             raise FilterStringError(
                 filter_string,
                 user="unknown right comparison",
-                detail=f"Got a dict for a value comparison: {value}",
+                detail=f"Got an expression for a value comparison: {item}",
             )
-        if comparator == "==":
-            next_comp = col == value
-        elif comparator == "!=":
-            next_comp = col != value
-        elif comparator == ">":
-            next_comp = col > value
-        elif comparator == ">=":
-            next_comp = col >= value
-        elif comparator == "<":
-            next_comp = col < value
-        elif comparator == "<=":
-            next_comp = col <= value
-        elif comparator == "IN":
-            next_comp = col.in_(value)
-        elif comparator == ["NOT", "IN"]:
-            next_comp = ~col.in_(value)
-        elif comparator == "LIKE":
-            next_comp = col.like(value)
-        elif comparator == ["NOT", "LIKE"]:
-            next_comp = ~col.like(value)
-        else:
+        comparison = _COMPARATORS.get(comparator)
+        if comparison is None:
             raise FilterStringError(
                 filter_string, user=f"Unknown comparator: {comparator}"
             )
+        return comparison(col, value)
 
-        if comp is not None and last_op == "AND":
-            comp = and_(comp, next_comp)
-        elif comp is not None and last_op == "OR":
-            comp = or_(comp, next_comp)
-        else:
-            comp = next_comp
-
-        if (index + 1) < len_parsed:
-            if parsed[index + 1] == "AND":
-                last_op = "AND"
-                index += 1
-            elif parsed[index + 1] == "OR":
-                last_op = "OR"
-                index += 1
-            else:
-                raise FilterStringError(
-                    filter_string, user=f"Unknown operator: {parsed[index + 1]}"
-                )
-
-        index += 1
-
-    return comp
+    return _build(parsed)
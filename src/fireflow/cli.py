@@ -1,22 +1,25 @@
 """A CLI for firecrest-wflow."""
 from enum import Enum
+from functools import cached_property
 import logging
 from pathlib import Path
 import typing as t
 
-from rich import box
 from rich.console import Console
-from rich.syntax import Syntax
-from rich.table import Table
-from rich.tree import Tree
 import typer
 from typer.core import TyperGroup
-import yaml
 
-from fireflow import __version__, orm
-from fireflow._sql_parse import filter_from_string
-from fireflow.process import REPORT_LEVEL, run_unfinished_calcjobs
-from fireflow.storage import Storage
+from fireflow import __version__
+
+if t.TYPE_CHECKING:
+    from rich.table import Table
+
+    from fireflow.orm import ProcessStates
+    from fireflow.storage import Storage
+
+# heavier imports (the storage and ORM, which load sqlalchemy, rich renderables, yaml,
+# the process and filter modules) are deferred to the commands that use them,
+# to keep CLI start-up fast
 
 console = Console()
 
@@ -26,8 +29,17 @@ class OrderedCommandsGroup(TyperGroup):
     rather than sorted by name.
     """
 
+    _command_names: t.Optional[t.List[str]] = None
+
+    def add_command(self, cmd: t.Any, name: t.Optional[str] = None) -> None:
+        super().add_command(cmd, name)
+        self._command_names = None
+
     def list_commands(self, ctx: t.Any) -> t.List[str]:
-        return list(self.commands)
+        # dicts preserve insertion order, so the names only need copying once
+        if self._command_names is None:
+            self._command_names = list(self.commands)
+        return self._command_names
 
 
 PANEL_NAME_PROJECT = "Project Commands"
@@ -77,30 +89,36 @@ def version_callback(value: bool) -> None:
         raise typer.Exit()
 
 
+def _load_yaml(stream: t.IO[bytes]) -> t.Any:
+    """Load YAML, with the (much faster) libyaml parser, if available."""
+    import yaml
+
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+_RowT = t.TypeVar("_RowT")
+
+
 def create_table(
     table_title: str,
-    data: t.Iterable[t.Dict[str, t.Any]],
-    *,
-    keys: t.Optional[t.List[str]] = None,
-    aliases: t.Optional[t.Dict[str, str]] = None,
-) -> Table:
+    columns: t.Sequence[t.Tuple[str, t.Callable[[_RowT], t.Any]]],
+    rows: t.Iterable[_RowT],
+) -> "Table":
     """Create a table to print
 
     :param table_title: The title of the table
-    :param data: A list of objects to print
-    :param keys: A list of keys to print, in order,
-        otherwise take from the first object
-    :param aliases: A dictionary mapping the keys to the column titles
+    :param columns: A list of column titles, and functions to get the cell value from a row
+    :param rows: The rows to print
     """
-    aliases = aliases or {}
+    from rich import box
+    from rich.table import Table
+
     table = Table(title=table_title, box=box.ROUNDED)
-    for i, obj in enumerate(data):
-        if i == 0:
-            if keys is None:
-                keys = list(obj)
-            for key in keys:
-                table.add_column(aliases.get(key, key), overflow="fold")
-        table.add_row(*(str(obj[key]) for key in (keys or [])))
+    for title, _ in columns:
+        table.add_column(title, overflow="fold")
+    getters = [getter for _, getter in columns]
+    for row in rows:
+        table.add_row(*[str(getter(row)) for getter in getters])
 
     return table
 
@@ -110,8 +128,8 @@ def config_callback(
 ) -> t.Optional[Path]:
     if value is not None:
         try:
-            with open(value, "r") as f:  # Load config file
-                conf = yaml.safe_load(f)
+            with open(value, "rb") as f:  # Load config file
+                conf = _load_yaml(f)
             ctx.default_map = ctx.default_map or {}  # Initialize the default map
             ctx.default_map.update(conf)  # Merge the config dict into default_map
         except Exception as ex:
@@ -126,26 +144,31 @@ class StorageContext:
         """Initialize the context."""
         if storage_dir is None:
             raise ValueError("storage_dir must be specified")
-        self._storage_dir = Path(storage_dir)
-        self._storage: t.Optional[Storage] = None
+        # only converted to a (resolved) `Path` when needed, since most commands never use it
+        self._storage_dir = storage_dir
+        self._storage: t.Optional["Storage"] = None
 
     def __str__(self) -> str:
-        return f"StorageContext({str(self.path)!r})"
+        return f"StorageContext({str(self._storage_dir)!r})"
 
-    @property
+    @cached_property
     def path(self) -> Path:
-        """Get the storage path."""
-        return self._storage_dir
+        """Get the (resolved) storage path."""
+        return Path(self._storage_dir).resolve()
 
     @property
-    def storage(self) -> Storage:
+    def storage(self) -> "Storage":
         """Get the storage."""
         if self._storage is None:
+            from fireflow.storage import Storage
+
             self._storage = Storage.from_path(self._storage_dir, init=False)
         return self._storage
 
     def init(self) -> None:
         """Initialize the storage."""
+        from fireflow.storage import Storage
+
         self._storage = Storage.from_path(self._storage_dir, init=True)
 
 
@@ -158,7 +181,6 @@ def main_app(
         "--project-path",
         file_okay=False,
         dir_okay=True,
-        resolve_path=True,
         help="Path to the project directory.",
     ),
     version: t.Optional[bool] = typer.Option(
@@ -182,7 +204,6 @@ def main_init(
         "--add",
         file_okay=True,
         dir_okay=False,
-        resolve_path=True,
         help="Add objects from a YAML configuration file.",
     ),
 ) -> None:
@@ -194,8 +215,8 @@ def main_init(
     )
     if add is not None:
         console.print("Adding objects...")
-        with open(add) as handle:
-            data = yaml.safe_load(handle)
+        with open(add, "rb") as handle:
+            data = _load_yaml(handle)
         added = storage.storage.save_from_dict(data)
         console.print("[green]Added objects :white_check_mark:[/green]", added)
 
@@ -207,24 +228,30 @@ def main_add(
         ...,
         file_okay=True,
         dir_okay=False,
-        resolve_path=True,
         help="Path to a YAML configuration file.",
     ),
 ) -> None:
     """Add multiple objects to a project, from a YAML file."""
     storage = ctx.ensure_object(StorageContext)
-    with open(config) as handle:
-        data = yaml.safe_load(handle)
+    with open(config, "rb") as handle:
+        data = _load_yaml(handle)
     console.print("Adding objects...")
     added = storage.storage.save_from_dict(data)
     console.print("[green]Added objects :white_check_mark:[/green]", added)
 
 
 def _add_plural(count: int, singular: str, plural_suffix: str = "s") -> str:
-    if count == 1:
-        return f"{count} {singular}"
-    else:
-        return f"{count} {singular}{plural_suffix}"
+    return f"{count} {singular}{'' if count == 1 else plural_suffix}"
+
+
+def _page_title(title: str, page: int, page_size: int, count: int) -> str:
+    """Create the title for a page of rows.
+
+    :param count: The number of rows, counted up to at most one past the page
+    """
+    last = page * page_size
+    total = f"{last}+" if count > last else str(count)
+    return f"{title} {last - page_size + 1}-{min(last, count)} of {total}"
 
 
 @app_main.command("status", rich_help_panel=PANEL_NAME_PROJECT)
@@ -233,22 +260,26 @@ def main_status(
 ) -> None:
     """Show some basic statistics about the project."""
     storage = ctx.ensure_object(StorageContext).storage
-    console.print("Object Store:")
-    console.print(f"- {_add_plural(storage.objects.count(), 'object')}")
-    console.print("Database:")
-    console.print(f"- {_add_plural(storage.count_rows(orm.Client), 'client')}")
-    console.print(f"- {_add_plural(storage.count_rows(orm.Code), 'code')}")
-    console.print(f"- {_add_plural(storage.count_rows(orm.CalcJob), 'calcjob')}")
+    summary = storage.status_summary()
+    # render as a single print, rather than one console layout pass per line
+    lines = [
+        "Object Store:",
+        f"- {_add_plural(storage.objects.count(), 'object')}",
+        "Database:",
+        f"- {_add_plural(summary['clients'], 'client')}",
+        f"- {_add_plural(summary['codes'], 'code')}",
+        f"- {_add_plural(summary['calcjobs'], 'calcjob')}",
+    ]
     for status, color in [
         ("playing", "blue"),
         ("paused", "orange"),
         ("finished", "green"),
         ("excepted", "red"),
     ]:
-        filter_ = [orm.Processing.state == status]
-        count = storage.count_rows(orm.Processing, where=filter_)
+        count = summary["states"].get(status, 0)
         if count > 0:
-            console.print(f"  - {count} [{color}]{status}[/{color}]")
+            lines.append(f"  - {count} [{color}]{status}[/{color}]")
+    console.print("\n".join(lines))
 
 
 class LogLevel(str, Enum):
@@ -261,14 +292,24 @@ class LogLevel(str, Enum):
 
     def to_int(self) -> int:
         """Convert the enum value to an integer."""
-        return {
-            LogLevel.debug: logging.DEBUG,
-            LogLevel.info: logging.INFO,
-            LogLevel.report: REPORT_LEVEL,
-            LogLevel.warning: logging.WARNING,
-            LogLevel.error: logging.ERROR,
-            LogLevel.critical: logging.CRITICAL,
-        }[self]
+        if not _LOG_LEVEL_TO_INT:
+            # filled on first use, so that fireflow.process is only imported when needed
+            from fireflow.process import REPORT_LEVEL
+
+            _LOG_LEVEL_TO_INT.update(
+                {
+                    LogLevel.debug: logging.DEBUG,
+                    LogLevel.info: logging.INFO,
+                    LogLevel.report: REPORT_LEVEL,
+                    LogLevel.warning: logging.WARNING,
+                    LogLevel.error: logging.ERROR,
+                    LogLevel.critical: logging.CRITICAL,
+                }
+            )
+        return _LOG_LEVEL_TO_INT[self]
+
+
+_LOG_LEVEL_TO_INT: t.Dict[LogLevel, int] = {}
 
 
 @app_main.command("run", rich_help_panel=PANEL_NAME_PROJECT)
@@ -280,6 +321,8 @@ def main_run(
     ),
 ) -> None:
     """Run unfinished calcjobs."""
+    from fireflow.process import run_unfinished_calcjobs
+
     storage = ctx.ensure_object(StorageContext).storage
     logging.basicConfig(
         format="%(asctime)s:%(name)s:%(levelname)s: %(message)s",
@@ -317,6 +360,8 @@ def client_create(
     ),
 ) -> None:
     """Create a new client."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     client = orm.Client(
         client_url=client_url,
@@ -340,6 +385,8 @@ def client_show(
     pk: int = typer.Argument(..., help="Primary key of the client to show"),
 ) -> None:
     """Show a client."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     client = storage.get_row(orm.Client, pk)
     console.print(client)
@@ -351,6 +398,8 @@ def client_delete(
     pk: int = typer.Argument(..., help="Primary key of the client to delete"),
 ) -> None:
     """Delete a client."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     client = storage.get_row(orm.Client, pk)
     typer.confirm(f"Are you sure you want to delete PK={pk}?", abort=True)
@@ -369,29 +418,30 @@ def client_list(
     debug: bool = typer.Option(False, help="Show more information for debugging"),
 ) -> None:
     """List Clients."""
+    from fireflow import orm
+    from fireflow._sql_parse import filter_from_string
+
     storage = ctx.ensure_object(StorageContext).storage
     where_clause = None if where is None else filter_from_string(orm.Client, where)
     if debug and where_clause is not None:
         console.print(f"[blue]WHERE clause: {where_clause}[/blue]")
-    count = storage.count_rows(orm.Client, where=where_clause)
+    count = storage.count_rows(
+        orm.Client, where=where_clause, limit=page * page_size + 1
+    )
     if not count:
         console.print("[green]No Clients to list[/green]")
         return
     table = create_table(
-        "Clients {}-{} of {}".format(
-            (page - 1) * page_size + 1, min(page * page_size, count), count
-        ),
-        (
-            {
-                "PK": client.pk,
-                "Label": client.label,
-                "Client URL": client.client_url,
-                "Client ID": client.client_id,
-                "Machine": client.machine_name,
-            }
-            for client in storage.iter_rows(
-                orm.Client, page=page, page_size=page_size, where=where_clause
-            )
+        _page_title("Clients", page, page_size, count),
+        [
+            ("PK", lambda client: client.pk),
+            ("Label", lambda client: client.label),
+            ("Client URL", lambda client: client.client_url),
+            ("Client ID", lambda client: client.client_id),
+            ("Machine", lambda client: client.machine_name),
+        ],
+        storage.iter_rows(
+            orm.Client, page=page, page_size=page_size, where=where_clause
         ),
     )
     console.print(table)
@@ -404,6 +454,8 @@ def code_show(
     client: bool = typer.Option(False, help="Show the client as well"),
 ) -> None:
     """Show a code."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     code = storage.get_row(orm.Code, pk)
     console.print(code)
@@ -417,6 +469,8 @@ def code_delete(
     pk: int = typer.Argument(..., help="Primary key of the code to delete"),
 ) -> None:
     """Delete a client."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     code = storage.get_row(orm.Code, pk)
     typer.confirm(f"Are you sure you want to delete PK={pk}?", abort=True)
@@ -435,29 +489,34 @@ def code_tree(
     debug: bool = typer.Option(False, help="Show more information for debugging"),
 ) -> None:
     """Tree of Client :left_arrow_curving_right: Code."""
+    from rich.tree import Tree
+
+    from fireflow import orm
+    from fireflow._sql_parse import filter_from_string
+
     storage = ctx.ensure_object(StorageContext).storage
     where_clause = None if where is None else filter_from_string(orm.Code, where)
     if debug and where_clause is not None:
         console.print(f"[blue]WHERE clause: {where_clause}[/blue]")
-    count = storage.count_rows(orm.Code, where=where_clause)
+    count = storage.count_rows(orm.Code, where=where_clause, limit=page * page_size + 1)
     if not count:
         console.print("[green]No Codes to list[/green]")
         return
     tree = Tree(
-        "[bold]Codes[/bold] {}-{} of {}".format(
-            (page - 1) * page_size + 1, min(page * page_size, count), count
-        ),
+        _page_title("[bold]Codes[/bold]", page, page_size, count),
         highlight=False,
     )
     client_nodes: t.Dict[int, Tree] = {}
     for code in storage.iter_rows(
-        orm.Code, page=page, page_size=page_size, where=where_clause
+        orm.Code, page=page, page_size=page_size, where=where_clause, eager=["client"]
     ):
-        if code.client.pk not in client_nodes:
-            client_nodes[code.client.pk] = tree.add(
-                f"[blue]{code.client.pk}[/blue] - {code.client.label}"
+        client = code.client
+        client_node = client_nodes.get(client.pk)
+        if client_node is None:
+            client_node = client_nodes[client.pk] = tree.add(
+                f"[blue]{client.pk}[/blue] - {client.label}"
             )
-        client_nodes[code.client.pk].add(f"[blue]{code.pk}[/blue] - {code.label}")
+        client_node.add(f"[blue]{code.pk}[/blue] - {code.label}")
     console.print(tree)
 
 
@@ -472,27 +531,30 @@ def code_list(
     debug: bool = typer.Option(False, help="Show more information for debugging"),
 ) -> None:
     """List Codes."""
+    from fireflow import orm
+    from fireflow._sql_parse import filter_from_string
+
     storage = ctx.ensure_object(StorageContext).storage
     where_clause = None if where is None else filter_from_string(orm.Code, where)
     if debug and where_clause is not None:
         console.print(f"[blue]WHERE clause: {where_clause}[/blue]")
-    count = storage.count_rows(orm.Code, where=where_clause)
+    count = storage.count_rows(orm.Code, where=where_clause, limit=page * page_size + 1)
     if not count:
         console.print("[green]No Codes to list[/green]")
         return
     table = create_table(
-        "Codes {}-{} of {}".format(
-            (page - 1) * page_size + 1, min(page * page_size, count), count
-        ),
-        (
-            {
-                "PK": code.pk,
-                "Label": code.label,
-                "Client": f"{code.client_pk} ({code.client.label})",
-            }
-            for code in storage.iter_rows(
-                orm.Code, page=page, page_size=page_size, where=where_clause
-            )
+        _page_title("Codes", page, page_size, count),
+        [
+            ("PK", lambda code: code.pk),
+            ("Label", lambda code: code.label),
+            ("Client", lambda code: f"{code.client_pk} ({code.client.label})"),
+        ],
+        storage.iter_rows(
+            orm.Code,
+            page=page,
+            page_size=page_size,
+            where=where_clause,
+            eager=["client"],
         ),
     )
     console.print(table)
@@ -506,6 +568,10 @@ def calcjob_show(
     script: bool = typer.Option(False, help="Show the rendered job script"),
 ) -> None:
     """Show a calcjob."""
+    from rich.syntax import Syntax
+
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     calcjob = storage.get_row(orm.CalcJob, pk)
     console.print(calcjob)
@@ -525,6 +591,8 @@ def calcjob_delete(
     pk: int = typer.Argument(..., help="Primary key of the calcjob to delete"),
 ) -> None:
     """Delete a calcjob."""
+    from fireflow import orm
+
     storage = ctx.ensure_object(StorageContext).storage
     calcjob = storage.get_row(orm.CalcJob, pk)
     typer.confirm(f"Are you sure you want to delete PK={pk}?", abort=True)
@@ -543,37 +611,45 @@ def calcjob_list(
     debug: bool = typer.Option(False, help="Show more information for debugging"),
 ) -> None:
     """List Codes."""
+    from fireflow import orm
+    from fireflow._sql_parse import filter_from_string
+
     storage = ctx.ensure_object(StorageContext).storage
     where_clause = None if where is None else filter_from_string(orm.CalcJob, where)
     if debug and where_clause is not None:
         console.print(f"[blue]WHERE clause: {where_clause}[/blue]")
-    count = storage.count_rows(orm.CalcJob, where=where_clause)
+    count = storage.count_rows(
+        orm.CalcJob, where=where_clause, limit=page * page_size + 1
+    )
     if not count:
         console.print("[green]No CalcJob to list[/green]")
         return
     table = create_table(
-        "CalcJob {}-{} of {}".format(
-            (page - 1) * page_size + 1, min(page * page_size, count), count
-        ),
-        (
-            {
-                "PK": calc.pk,
-                # "UUID": str(calc.uuid),
-                "Label": calc.label,
-                "Code": f"{calc.code_pk} ({calc.code.label})",
-                "Client": f"{calc.code.client_pk} ({calc.code.client.label})",
-                "State": calc.state,
-                "Step": calc.process.step,
-            }
-            for calc in storage.iter_rows(
-                orm.CalcJob, page=page, page_size=page_size, where=where_clause
-            )
+        _page_title("CalcJob", page, page_size, count),
+        [
+            ("PK", lambda calc: calc.pk),
+            # ("UUID", lambda calc: calc.uuid),
+            ("Label", lambda calc: calc.label),
+            ("Code", lambda calc: f"{calc.code_pk} ({calc.code.label})"),
+            (
+                "Client",
+                lambda calc: f"{calc.code.client_pk} ({calc.code.client.label})",
+            ),
+            ("State", lambda calc: calc.state),
+            ("Step", lambda calc: calc.process.step),
+        ],
+        storage.iter_rows(
+            orm.CalcJob,
+            page=page,
+            page_size=page_size,
+            where=where_clause,
+            eager=["code.client", "process"],
         ),
     )
     console.print(table)
 
 
-_STATE_EMOJI = {
+_STATE_EMOJI: "dict[ProcessStates, str]" = {
     "playing": ":arrow_forward:",
     "paused": ":pause_button:",
     "finished": ":white_check_mark:",
@@ -592,35 +668,50 @@ def calcjob_tree(
     debug: bool = typer.Option(False, help="Show more information for debugging"),
 ) -> None:
     """Tree of Client :left_arrow_curving_right: Code :left_arrow_curving_right: CalcJob."""
+    from rich.tree import Tree
+
+    from fireflow import orm
+    from fireflow._sql_parse import filter_from_string
+
     storage = ctx.ensure_object(StorageContext).storage
     where_clause = None if where is None else filter_from_string(orm.CalcJob, where)
     if debug and where_clause is not None:
         console.print(f"[blue]WHERE clause: {where_clause}[/blue]")
-    count = storage.count_rows(orm.CalcJob, where=where_clause)
+    count = storage.count_rows(
+        orm.CalcJob, where=where_clause, limit=page * page_size + 1
+    )
     if not count:
         console.print("[green]No CalcJob to list[/green]")
         return
     tree = Tree(
-        "[bold]Calcjobs[/bold] {}-{} of {}".format(
-            (page - 1) * page_size + 1, min(page * page_size, count), count
-        ),
+        _page_title("[bold]Calcjobs[/bold]", page, page_size, count),
         highlight=False,
     )
     client_nodes: t.Dict[int, Tree] = {}
     code_nodes: t.Dict[int, Tree] = {}
     for calcjob in storage.iter_rows(
-        orm.CalcJob, page=page, page_size=page_size, where=where_clause
+        orm.CalcJob,
+        page=page,
+        page_size=page_size,
+        where=where_clause,
+        eager=["code.client", "process"],
     ):
-        if calcjob.code.client.pk not in client_nodes:
-            client_nodes[calcjob.code.client.pk] = tree.add(
-                f"[blue]{calcjob.code.client.pk}[/blue] - {calcjob.code.client.label}"
-            )
-        if calcjob.code.pk not in code_nodes:
-            code_nodes[calcjob.code.pk] = client_nodes[calcjob.code.client.pk].add(
-                f"[blue]{calcjob.code.pk}[/blue] - {calcjob.code.label}"
+        # bind the related rows once, since each attribute access goes through the ORM
+        code = calcjob.code
+        code_node = code_nodes.get(code.pk)
+        if code_node is None:
+            client = code.client
+            client_node = client_nodes.get(client.pk)
+            if client_node is None:
+                client_node = client_nodes[client.pk] = tree.add(
+                    f"[blue]{client.pk}[/blue] - {client.label}"
+                )
+            code_node = code_nodes[code.pk] = client_node.add(
+                f"[blue]{code.pk}[/blue] - {code.label}"
             )
-        code_nodes[calcjob.code.pk].add(
-            f"[blue]{calcjob.pk}[/blue] - {calcjob.label} {_STATE_EMOJI[calcjob.state]}"
+        code_node.add(
+            f"[blue]{calcjob.pk}[/blue] - {calcjob.label} "
+            f"{_STATE_EMOJI[calcjob.state]}"
         )
 
     console.print(tree)
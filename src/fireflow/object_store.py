@@ -2,15 +2,25 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
 import hashlib
 from io import BytesIO
+import mmap
 import os
 from pathlib import Path
+import shutil
 import tempfile
-from typing import Any, BinaryIO, Iterable, Protocol, TypeVar
+import threading
+from typing import IO, Any, BinaryIO, Callable, Iterable, Protocol, TypeVar
 
-COPY_BUFSIZE = 64 * 1024
+COPY_BUFSIZE = 1024 * 1024
+
+MMAP_THRESHOLD = 8 * 1024 * 1024
+"""Files at least this size are memory-mapped, when added to a file object store."""
+
+TEMP_PREFIX = ".tmp-"
+"""The prefix of in-progress (temporary) files, in a file object store."""
 
 
 class ObjectStore(ABC):
@@ -39,6 +49,8 @@ class ObjectStore(ABC):
     def add_from_io(self, obj: BinaryStream, *, chunks: int = COPY_BUFSIZE) -> str:
         """Add an object to the store idempotently and atomically.
 
+        For small objects already in memory, prefer `add_from_bytes`.
+
         :param obj: the object to store
         :param chunks: the size of chunks to stream in
         :return: the key of the object
@@ -65,10 +77,14 @@ class ObjectStore(ABC):
         :param chunks: the size of chunks to stream in
         :return: a mapping from the path to the key of the object
         """
-        added = {}
-        for glob_path in path.glob(glob):
-            added[str(glob_path)] = self.add_from_path(glob_path, chunks=chunks)
-        return added
+        paths = list(path.glob(glob))
+        if len(paths) < 2:
+            return {str(p): self.add_from_path(p, chunks=chunks) for p in paths}
+        # reading and hashing release the GIL, so files can be added concurrently
+        workers = min(32, len(paths), (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            keys = executor.map(lambda p: self.add_from_path(p, chunks=chunks), paths)
+            return {str(p): key for p, key in zip(paths, keys)}
 
     @abstractmethod
     def __contains__(self, sha256: str) -> bool:
@@ -143,7 +159,9 @@ class ObjectWriter(ABC):
     @property
     @abstractmethod
     def key(self) -> None | str:
-        """Get the key of the object that was written."""
+        """Get the key of the object that was written
+        (set once the context exits without an exception, even if nothing was written).
+        """
 
 
 _T2 = TypeVar("_T2", bound="DefaultObjectWriter")
@@ -153,7 +171,8 @@ class DefaultObjectWriter(ObjectWriter):
     def __init__(self, store: ObjectStore) -> None:
         self._store = store
         self._key: str | None = None
-        self._data: bytes = b""
+        # joined on exit, since repeatedly concatenating bytes is quadratic
+        self._chunks: list[bytes] = []
         self._open: None | bool = (
             None  # None before entering, True after, False after exiting
         )
@@ -175,20 +194,25 @@ class DefaultObjectWriter(ObjectWriter):
         traceback: Any,
     ) -> None:
         self._open = False
-        if exc_type is not None or not self._data:
+        if exc_type is not None:
             return
-        self._key = self._store.add_from_bytes(self._data)
+        # an empty object is still stored, so that the key is always set
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self._key = self._store.add_from_bytes(data)
 
     def write(self, data: bytes) -> None:
         if self._open is not True:
             raise ValueError("Writer not in context")
-        self._data += data
+        if data:
+            self._chunks.append(data)
 
 
 class InMemoryObjectStore(ObjectStore):
     def __init__(self) -> None:
         """Initialize the store."""
         self._store: dict[str, bytes] = {}
+        self._lock = threading.Lock()
 
     def count(self) -> int:
         return len(self._store)
@@ -201,8 +225,8 @@ class InMemoryObjectStore(ObjectStore):
 
     def add_from_bytes(self, obj: bytes) -> str:
         sha256 = hashlib.sha256(obj).hexdigest()
-        if sha256 not in self._store:
-            self._store[sha256] = obj
+        with self._lock:
+            self._store.setdefault(sha256, obj)
         return sha256
 
     def __contains__(self, sha256: str) -> bool:
@@ -216,29 +240,104 @@ class InMemoryObjectStore(ObjectStore):
 
 
 class FileObjectStore(ObjectStore):
+    """An object store on the file system.
+
+    Objects are stored with a two-level fanout,
+    i.e. at ``<path>/<key[:2]>/<key[2:]>``,
+    so that no single directory grows too large.
+    Objects stored directly at ``<path>/<key>``, by earlier versions, are still read.
+    """
+
     def __init__(self, path: Path | str) -> None:
         """Initialize the store."""
         self._path = Path(path)
+        # hot paths join strings, rather than creating `Path` objects
+        self._path_str = os.fspath(self._path)
+        # keys known to be in the store, to avoid a stat per lookup
+        self._known: set[str] = set()
+        self._has_flat: bool | None = None
+
+    def invalidate(self) -> None:
+        """Forget cached knowledge of stored objects,
+        e.g. after the store directory has been modified externally.
+        """
+        self._known.clear()
+        self._has_flat = None
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self._path_str, sha256[:2], sha256[2:])
+
+    def _flat_path(self, sha256: str) -> str | None:
+        """Return the path of an object in the flat layout, if any may exist."""
+        if self._has_flat is None:
+            with os.scandir(self._path_str) as entries:
+                # shard directories have two character names
+                self._has_flat = any(
+                    len(e.name) > 2 and not e.name.startswith(TEMP_PREFIX)
+                    for e in entries
+                )
+        return os.path.join(self._path_str, sha256) if self._has_flat else None
+
+    def _exists(self, sha256: str) -> bool:
+        """Check if an object is in the store, remembering those that are."""
+        if sha256 in self._known:
+            return True
+        if os.path.exists(self._object_path(sha256)) or (
+            (flat_path := self._flat_path(sha256)) is not None
+            and os.path.exists(flat_path)
+        ):
+            self._known.add(sha256)
+            return True
+        return False
+
+    def _move_into_store(self, temp_path: str, sha256: str) -> None:
+        """Move a complete temporary file into the store, as an object."""
+        path = self._object_path(sha256)
+        try:
+            os.replace(temp_path, path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        self._known.add(sha256)
+
+    def _iter_entries(self) -> Iterable[tuple[str, os.DirEntry[str]]]:
+        """Iterate over the (key prefix, entry) of all objects in the store."""
+        with os.scandir(self._path_str) as entries:
+            for entry in entries:
+                if entry.name.startswith(TEMP_PREFIX):
+                    continue
+                if len(entry.name) == 2 and entry.is_dir():
+                    with os.scandir(entry.path) as shard:
+                        for sub_entry in shard:
+                            yield entry.name, sub_entry
+                else:
+                    yield "", entry
 
     def count(self) -> int:
-        return sum(1 for _ in self._path.iterdir())
+        return sum(1 for _ in self._iter_entries())
 
     def keys(self) -> Iterable[str]:
-        return (p.name for p in self._path.iterdir())
+        for prefix, entry in self._iter_entries():
+            yield prefix + entry.name
 
     def add_from_bytes(self, obj: bytes) -> str:
         sha256 = hashlib.sha256(obj).hexdigest()
 
-        path = self._path / sha256
-        if path.exists():
-            return sha256
-
-        try:
-            path.write_bytes(obj)
-        except Exception:
-            if path.exists():
-                path.unlink()
-            raise
+        if not self._exists(sha256):
+            path = self._object_path(sha256)
+            try:
+                # exclusive creation also guards against a concurrent write
+                with _open_new(path) as handle:
+                    try:
+                        handle.write(obj)
+                    except BaseException:
+                        # only remove the (incomplete) file created here
+                        handle.close()
+                        os.remove(path)
+                        raise
+            except FileExistsError:
+                pass
+            self._known.add(sha256)
         return sha256
 
     def add_from_io(self, obj: BinaryStream, *, chunks: int = COPY_BUFSIZE) -> str:
@@ -248,50 +347,187 @@ class FileObjectStore(ObjectStore):
         whilst computing its hash.
         If the object is already in the store, the temporary file is deleted.
         If the object is not in the store, the temporary file is moved to the store.
+        Objects that fit in a single chunk are hashed first,
+        so no temporary file is needed if they are already in the store.
         """
+        first = obj.read(chunks)
+        second = obj.read(chunks) if first else b""
+        if not second:
+            sha256 = hashlib.sha256(first).hexdigest()
+            if self._exists(sha256):
+                return sha256
+
         hasher = hashlib.sha256()
-        with tempfile.NamedTemporaryFile("wb", delete=False) as temp:
-            while True:
-                chunk = obj.read(chunks)
-                if not chunk:
-                    break
-                hasher.update(chunk)
-                temp.write(chunk)
+        # the temporary file is in the store directory, so moving it is an atomic rename
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=self._path, prefix=TEMP_PREFIX, delete=False
+        ) as temp:
+            try:
+                writer = _HashingWriter(temp.write, hasher.update)
+                writer.write(first)
+                if second:
+                    writer.write(second)
+                    _copy_stream(obj, writer, chunks)
+            except BaseException:
+                temp.close()
+                os.remove(temp.name)
+                raise
 
         sha256 = hasher.hexdigest()
-        path = self._path / sha256
 
-        if path.exists():
-            Path(temp.name).unlink()
-            return sha256
+        if self._exists(sha256):
+            os.remove(temp.name)
         else:
-            os.rename(temp.name, path)
+            self._move_into_store(temp.name, sha256)
         return sha256
 
-    def __contains__(self, sha256: str) -> bool:
-        return (self._path / sha256).exists()
+    def add_from_path(self, path: Path | str, *, chunks: int = COPY_BUFSIZE) -> str:
+        """Add an object to the store idempotently and atomically.
 
-    def _get_path(self, sha256: str) -> Path:
-        _path = self._path / sha256
-        if not _path.exists():
-            raise KeyError(sha256)
-        return _path
+        Large files are memory-mapped and hashed before anything is written,
+        so nothing is written if they are already in the store.
+        Otherwise, they are copied by the kernel (see `_copy_file`),
+        and the copy is hashed again, so that its key always matches its content,
+        even if the source file changed in the meantime.
+        """
+        with open(path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                return self.add_from_io(handle, chunks=chunks)
+            sha256 = _hash_mapped(handle)
+            if self._exists(sha256):
+                return sha256
+
+            with tempfile.NamedTemporaryFile(
+                "wb", dir=self._path, prefix=TEMP_PREFIX, delete=False
+            ) as temp:
+                try:
+                    _copy_file(handle, temp, size)
+                except BaseException:
+                    temp.close()
+                    os.remove(temp.name)
+                    raise
+
+        try:
+            with open(temp.name, "rb") as copied:
+                sha256 = _hash_mapped(copied)
+        except BaseException:
+            os.remove(temp.name)
+            raise
+        if self._exists(sha256):
+            os.remove(temp.name)
+        else:
+            self._move_into_store(temp.name, sha256)
+        return sha256
+
+    def __contains__(self, sha256: str) -> bool:
+        return self._exists(sha256)
 
     def get_size(self, sha256: str) -> int:
-        path = self._get_path(sha256)
-        return path.stat().st_size
+        try:
+            return os.stat(self._object_path(sha256)).st_size
+        except FileNotFoundError:
+            flat_path = self._flat_path(sha256)
+            if flat_path is None or not os.path.exists(flat_path):
+                raise KeyError(sha256) from None
+            return os.stat(flat_path).st_size
 
     def open(self, sha256: str) -> BinaryIO:
-        path = self._get_path(sha256)
-        return path.open("rb")
+        try:
+            return open(self._object_path(sha256), "rb")
+        except FileNotFoundError:
+            flat_path = self._flat_path(sha256)
+            if flat_path is None or not os.path.exists(flat_path):
+                raise KeyError(sha256) from None
+            return open(flat_path, "rb")
 
     def open_for_write(self) -> ObjectWriter:
-        return FileObjectWriter(self._path)
+        return FileObjectWriter(self)
+
+
+class _HashingWriter:
+    """A writer that passes data to a hash update, and on to another writer."""
+
+    __slots__ = ("_update", "_write")
+
+    def __init__(
+        self,
+        write: Callable[[bytes | memoryview], object],
+        update: Callable[[bytes | memoryview], None],
+    ) -> None:
+        self._write = write
+        self._update = update
+
+    def write(self, data: bytes | memoryview) -> None:
+        self._update(data)
+        self._write(data)
+
+
+def _open_new(path: str) -> IO[bytes]:
+    """Create and open a new file for writing, making its directory if necessary.
+
+    :raises FileExistsError: If the file already exists
+    """
+    try:
+        return open(path, "xb")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "xb")
+
+
+def _copy_stream(src: BinaryStream, dst: _HashingWriter, chunks: int) -> None:
+    """Copy the rest of a stream in chunks.
+
+    Streams supporting ``readinto`` are read into a single reused buffer,
+    rather than allocating new bytes for every chunk.
+    """
+    readinto = getattr(src, "readinto", None)
+    if readinto is None:
+        shutil.copyfileobj(src, dst, chunks)
+        return
+    with memoryview(bytearray(chunks)) as buffer:
+        while size := readinto(buffer):
+            dst.write(buffer[:size])
+
+
+def _hash_mapped(handle: IO[bytes]) -> str:
+    """Hash the content of a file, by memory-mapping it."""
+    if not os.fstat(handle.fileno()).st_size:
+        return hashlib.sha256().hexdigest()  # empty files cannot be mapped
+    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # a single update over the whole buffer releases the GIL throughout
+        return hashlib.sha256(mapped).hexdigest()
+
+
+def _copy_file(src: IO[bytes], dst: IO[bytes], size: int) -> None:
+    """Copy the start of one file to another.
+
+    Where available, ``copy_file_range`` copies within the kernel
+    (or clones the blocks, on file systems supporting reflinks),
+    with a fall back to a buffered copy for the remainder.
+    """
+    offset = 0
+    copy_range = getattr(os, "copy_file_range", None)
+    if copy_range is not None:
+        try:
+            while offset < size:
+                copied = copy_range(
+                    src.fileno(), dst.fileno(), size - offset, offset, offset
+                )
+                if not copied:
+                    break
+                offset += copied
+        except OSError:
+            pass  # e.g. not supported between these file systems
+    if offset < size:
+        src.seek(offset)
+        dst.seek(offset)
+        shutil.copyfileobj(src, dst, COPY_BUFSIZE)
 
 
 class FileObjectWriter(ObjectWriter):
-    def __init__(self, path: str | Path) -> None:
-        self._path = Path(path)
+    def __init__(self, store: FileObjectStore) -> None:
+        self._store = store
         self._key: str | None = None
         self._open: None | bool = (
             None  # None before entering, True after, False after exiting
@@ -301,7 +537,7 @@ class FileObjectWriter(ObjectWriter):
 
     @property
     def key(self) -> str | None:
-        return self._sha256
+        return self._key
 
     def __enter__(self: _Self3) -> _Self3:
         if self._open is False:
@@ -310,7 +546,9 @@ class FileObjectWriter(ObjectWriter):
             return self
         self._open = True
         self._hasher = hashlib.sha256()
-        self._file = tempfile.NamedTemporaryFile("wb", delete=False)  # type: ignore[assignment]
+        self._file = tempfile.NamedTemporaryFile(  # type: ignore[assignment]
+            "wb", dir=self._store._path, prefix=TEMP_PREFIX, delete=False
+        )
         return self
 
     def write(self, obj: bytes) -> None:
@@ -326,19 +564,19 @@ class FileObjectWriter(ObjectWriter):
         traceback: Any,
     ) -> None:
         self._open = False
+        assert self._file is not None
+        assert self._hasher is not None
+        self._file.close()
+        committed = False
         try:
             if exc_type is None:
-
-                assert self._hasher is not None
                 sha256: str = self._hasher.hexdigest()
-                path = self._path / sha256
-
-                if not path.exists():
-                    assert self._file is not None
-                    os.rename(self._file.name, path)
+                if not self._store._exists(sha256):
+                    self._store._move_into_store(self._file.name, sha256)
+                    committed = True
+                self._key = sha256
         finally:
-            if self._file and Path(self._file.name).exists():
-                Path(self._file.name).unlink()
-            self._sha256 = sha256
+            if not committed:
+                os.remove(self._file.name)
             self._file = None
             self._hasher = None
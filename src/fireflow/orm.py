@@ -8,6 +8,7 @@ Client
 See also: https://docs.sqlalchemy.org/en/20/orm/quickstart.html
 """
 import dataclasses
+from functools import lru_cache
 from pathlib import PurePosixPath, PureWindowsPath
 import posixpath
 import random
@@ -142,6 +143,12 @@ def _validate_virtual_fs(
                 )
 
 
+@lru_cache(maxsize=128)
+def _compile_template(source: str) -> Template:
+    """Compile a job script template, once per distinct source."""
+    return t.cast(Template, Template(source))
+
+
 class Base(MappedAsDataclass, DeclarativeBase):
     """Base class for all tables."""
 
@@ -345,6 +352,9 @@ class Code(Base):
 
 
 ProcessStates = t.Literal["playing", "paused", "finished", "excepted"]
+ProcessSteps = t.Literal[
+    "created", "uploading", "submitting", "running", "retrieving", "finalised"
+]
 
 
 class CalcJob(Base):
@@ -429,7 +439,7 @@ class CalcJob(Base):
     def create_job_script(self) -> str:
         """Create the job script from the template."""
         # TODO check this can be generated without errors, before saving
-        return Template(self.code.script).render(
+        return _compile_template(self.code.script).render(
             calc=self, code=self.code, client=self.code.client
         )
 
@@ -454,11 +464,7 @@ class Processing(Base):
     state: Mapped[ProcessStates] = mapped_column(default="playing")
     """The state of the calcjob."""
 
-    step: Mapped[
-        t.Literal[
-            "created", "uploading", "submitting", "running", "retrieving", "finalised"
-        ]
-    ] = mapped_column(default="created")
+    step: Mapped[ProcessSteps] = mapped_column(default="created")
     """The step of the calcjob."""
 
     job_id: Mapped[t.Optional[str]] = mapped_column(default=None)
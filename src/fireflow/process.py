@@ -2,13 +2,29 @@
 from __future__ import annotations
 
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 from io import BytesIO
 from itertools import chain
 import logging
 import os
+from pathlib import PurePath
 import posixpath
+import random
+import threading
 import time
-from typing import Any, BinaryIO, Sequence, TypedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Sequence,
+    TypedDict,
+    TypeVar,
+)
+from weakref import WeakKeyDictionary
 
 import aiohttp
 import firecrest
@@ -16,13 +32,41 @@ from virtual_glob import glob as vglob
 
 from fireflow._remote_path import RemotePath
 from fireflow.object_store import ObjectStore
-from fireflow.orm import CalcJob, Code, Processing
+from fireflow.orm import CalcJob, Code, Processing, ProcessSteps
 from fireflow.storage import Storage
 
 LOGGER = logging.getLogger(__name__)
 REPORT_LEVEL = logging.INFO + 5
 logging.addLevelName(REPORT_LEVEL, "REPORT")
 
+POLL_BACKOFF = 1.5
+"""The factor by which polling intervals grow, whilst waiting on the remote."""
+POLL_JITTER = 0.2
+"""The maximum fraction by which polling intervals are randomly extended."""
+MACHINE_CONCURRENCY = 8
+"""The default maximum number of calcjobs concurrently transferring to/from,
+or submitting to, each machine."""
+UPLOAD_CONCURRENCY = 8
+"""The maximum number of concurrent uploads, per calcjob."""
+DOWNLOAD_CONCURRENCY = 16
+"""The maximum number of concurrent downloads, per calcjob."""
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+"""The maximum size of chunks to read from download responses."""
+HTTP_DNS_CACHE_TTL = 300
+"""The time (in seconds) for which the HTTP session caches DNS lookups,
+since the transfer URLs are mostly on the same (object storage) hosts."""
+
+FIRECREST_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="firecrest")
+"""The thread pool for blocking FirecREST requests,
+separate from the event loop's default executor (used e.g. for DNS resolution)."""
+
+_T = TypeVar("_T")
+
+_CLIENT_LOCKS: WeakKeyDictionary[
+    firecrest.Firecrest, threading.Lock
+] = WeakKeyDictionary()
+"""The lock serializing the requests of each FirecREST client."""
+
 
 def report(pk: int, msg: str, *args: Any) -> None:
     """Report on the calcjob process."""
@@ -31,19 +75,58 @@ def report(pk: int, msg: str, *args: Any) -> None:
 
 def run_unfinished_calcjobs(storage: Storage, limit: None | int = None) -> None:
     """Run all unfinished calcjobs."""
-    running = list(
-        storage.iter_rows(
-            Processing,
-            page_size=limit,
-            where=[Processing.state == "playing"],
-        )
-    )
+    running = storage.get_unfinished(limit)
     asyncio.run(run_multiple_calcjobs(running, storage))
 
 
-async def run_multiple_calcjobs(calcs: Sequence[Processing], storage: Storage) -> None:
-    """Run multiple calcjobs."""
-    await asyncio.gather(*[run_calcjob(calc, storage) for calc in calcs])
+async def run_multiple_calcjobs(
+    calcs: Sequence[Processing],
+    storage: Storage,
+    *,
+    flush_interval: float = 1.0,
+    machine_concurrency: int = MACHINE_CONCURRENCY,
+) -> None:
+    """Run multiple calcjobs.
+
+    :param flush_interval: The interval (in seconds) at which
+        updates to the calcjob processes are committed to the storage
+    :param machine_concurrency: The maximum number of calcjobs
+        concurrently running steps (other than waiting on the job) per machine
+    """
+    flusher = asyncio.create_task(flush_updates_periodically(storage, flush_interval))
+    try:
+        # a single HTTP session (and so connection pool) is shared by all transfers
+        # and the remote jobs are polled together, rather than each separately
+        poller = JobPoller()
+        limits: dict[str, asyncio.Semaphore] = {}
+        for calc in calcs:
+            machine = calc.calcjob.code.client.machine_name
+            if machine not in limits:
+                limits[machine] = asyncio.Semaphore(machine_concurrency)
+        connector = aiohttp.TCPConnector(ttl_dns_cache=HTTP_DNS_CACHE_TTL)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(
+                *[
+                    run_calcjob(
+                        calc,
+                        storage,
+                        session=session,
+                        poller=poller,
+                        limit=limits[calc.calcjob.code.client.machine_name],
+                    )
+                    for calc in calcs
+                ]
+            )
+    finally:
+        flusher.cancel()
+        storage._flush_updates()
+
+
+async def flush_updates_periodically(storage: Storage, interval: float) -> None:
+    """Periodically commit the queued updates to the storage."""
+    while True:
+        await asyncio.sleep(interval)
+        storage._flush_updates()
 
 
 async def reliquish() -> None:
@@ -51,33 +134,94 @@ async def reliquish() -> None:
     await asyncio.sleep(0)
 
 
-async def run_calcjob(process: Processing, storage: Storage) -> None:
-    """Run a single calcjob."""
+async def in_thread(func: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """Run a blocking call (e.g. a FirecREST request) in the `FIRECREST_EXECUTOR`,
+    so that it does not block the event loop, and so the other calcjobs.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        FIRECREST_EXECUTOR, partial(func, *args, **kwargs)
+    )
+
+
+async def in_client_thread(
+    client: firecrest.Firecrest, func: Callable[..., _T], *args: Any, **kwargs: Any
+) -> _T:
+    """Run a blocking call, making requests with ``client``, via `in_thread`.
+
+    A pyfirecrest client keeps the state of the current request on the instance,
+    so is not thread-safe: the calls for each client are serialized,
+    whilst those for different clients run concurrently.
+    """
+    # locks are only created on the event loop thread, so no further guard is needed
+    lock = _CLIENT_LOCKS.get(client)
+    if lock is None:
+        lock = _CLIENT_LOCKS[client] = threading.Lock()
+
+    def call() -> _T:
+        with lock:
+            return func(*args, **kwargs)
+
+    return await in_thread(call)
+
+
+async def run_calcjob(
+    process: Processing,
+    storage: Storage,
+    *,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
+    limit: asyncio.Semaphore | None = None,
+) -> None:
+    """Run a single calcjob.
+
+    :param session: The HTTP session to use for object transfers
+    :param poller: The poller to wait on the remote job with
+    :param limit: A semaphore to hold whilst running steps that make requests
+        to the remote, i.e. all but waiting on the job (whose polling is batched)
+    """
     process._freeze(False)  # TODO better way to do this?
     while process.step != "finalised":
         try:
-            await run_step(process, storage)
+            if limit is None or process.step == "running":
+                await run_step(process, storage, session=session, poller=poller)
+            else:
+                async with limit:
+                    await run_step(process, storage, session=session, poller=poller)
         except Exception as exc:
             LOGGER.exception("Error running calcjob %s", process.calcjob.uuid)
             process.state = "excepted"
             exc_str = f"{type(exc).__name__}: {exc}"
             process.exception = exc_str
-            storage._update_row(process)
+            storage._queue_update(process)
             break
-        storage._update_row(process)
+        storage._queue_update(process)
         await reliquish()
 
     if process.step == "finalised":
         process.state = "finished"
-        storage._update_row(process)
+        storage._queue_update(process)
 
+    # updates are batched during the run, but always committed once it ends
+    storage._flush_updates()
+
+
+async def run_step(
+    process: Processing,
+    storage: Storage,
+    *,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
+) -> None:
+    """Run a single step of a calcjob.
 
-async def run_step(process: Processing, storage: Storage) -> None:
-    """Run a single step of a calcjob."""
+    :param session: The HTTP session to use for object transfers
+    :param poller: The poller to wait on the remote job with
+    """
     calc = process.calcjob
 
     # note all tasks are standardised to use the same interface
-    # (even though some do not need the object store)
+    # (even though some do not need the object store, HTTP session or job poller)
 
     # TODO maybe also take in global settings object
     # TODO should they take in the calcjob and the process?
@@ -86,34 +230,42 @@ async def run_step(process: Processing, storage: Storage) -> None:
 
     if process.step == "created":
         process.step = "uploading"
-    if process.step == "uploading":
-        await copy_to_remote(calc, storage.objects)
-        process.step = "submitting"
-    elif process.step == "submitting":
-        await submit_on_remote(calc, storage.objects)
-        process.step = "running"
-    elif process.step == "running":
-        await poll_until_finished(calc, storage.objects)
-        process.step = "retrieving"
-    elif process.step == "retrieving":
-        await copy_from_remote(calc, storage.objects)
-        process.step = "finalised"
-    else:
-        raise ValueError(f"Unknown step name {process.step}")
+    try:
+        step, next_step = STEPS[process.step]
+    except KeyError:
+        raise ValueError(f"Unknown step name {process.step}") from None
+    await step(calc, storage.objects, session=session, poller=poller)
+    process.step = next_step
 
 
 async def poll_object_transfer(
-    obj: firecrest.ExternalStorage, interval: int = 1, timeout: int | None = None
+    obj: firecrest.ExternalStorage,
+    interval: float = 0.5,
+    timeout: int | None = None,
+    *,
+    max_interval: float = 30,
 ) -> None:
-    """Poll until an object  has been transferred to/from the store."""
+    """Poll until an object  has been transferred to/from the store.
+
+    The polling interval grows geometrically from ``interval`` up to ``max_interval``,
+    with some random jitter, so that concurrent transfers do not poll in lockstep.
+    """
     start = time.time()
-    while obj.in_progress:
+    # the status is requested from the server, so this is a blocking call
+    while await in_client_thread(obj.client, getattr, obj, "in_progress"):
         if timeout and time.time() - start > timeout:
             raise RuntimeError("timeout waiting for object transfer")
-        await asyncio.sleep(interval)
+        await asyncio.sleep(interval * random.uniform(1, 1 + POLL_JITTER))
+        interval = min(interval * POLL_BACKOFF, max_interval)
 
 
-async def copy_to_remote(calc: CalcJob, ostore: ObjectStore) -> None:
+async def copy_to_remote(
+    calc: CalcJob,
+    ostore: ObjectStore,
+    *,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
+) -> None:
     """Copy the calculation inputs to the compute resource."""
     # TODO could use checksums, to confirm upload,
     # see also: https://github.com/eth-cscs/pyfirecrest/issues/14
@@ -124,47 +276,56 @@ async def copy_to_remote(calc: CalcJob, ostore: ObjectStore) -> None:
     remote_folder = calc.remote_path
     report(calc.pk, "Uploading files to remote")
 
-    # create the base remote folder
     client = client_row.client
-    client.mkdir(client_row.machine_name, str(remote_folder), p=True)
-
-    # create and upload the script file
-    job_script = calc.create_job_script().encode("utf-8")
-    client.simple_upload(
-        client_row.machine_name,
-        BytesIO(job_script),
-        str(remote_folder),
-        Code.script_filename,
-    )
-    await reliquish()
-
-    # upload files / make directories specified on the code and calcjob
-    for rel_path, key in chain(
-        calc.code.upload_paths.items(), calc.upload_paths.items()
-    ):
-        remote_path = remote_folder.joinpath(*posixpath.split(rel_path))
-        if key is None:
-            client.mkdir(client_row.machine_name, str(remote_path), p=True)
-        else:
-            if remote_path.parent != remote_folder:
-                client.mkdir(client_row.machine_name, str(remote_path.parent), p=True)
+    machine = client_row.machine_name
+    small_file_size = client_row.small_file_size_mb * 1024 * 1024
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def make_dir(remote_path: PurePath) -> None:
+        """Make a single directory (and its parents)."""
+        async with semaphore:
+            await in_client_thread(
+                client, client.mkdir, machine, str(remote_path), p=True
+            )
+
+    async def upload_script() -> None:
+        """Create and upload the script file."""
+        job_script = calc.create_job_script().encode("utf-8")
+        async with semaphore:
+            await in_client_thread(
+                client,
+                client.simple_upload,
+                machine,
+                BytesIO(job_script),
+                str(remote_folder),
+                Code.script_filename,
+            )
+
+    async def upload(remote_path: PurePath, key: str) -> None:
+        """Upload a single file."""
+        async with semaphore:
             file_size = ostore.get_size(key)
-            if file_size <= client_row.small_file_size_mb * 1024 * 1024:
+            if file_size <= small_file_size:
                 with ostore.open(key) as obj:
                     # TODO big uqwploads
-                    client.simple_upload(
-                        client_row.machine_name,
+                    await in_client_thread(
+                        client,
+                        client.simple_upload,
+                        machine,
                         obj,
                         str(remote_path.parent),
                         remote_path.name,
                     )
-                await reliquish()
             else:
                 # Note, officially the API requires a sourcepath on disk,
                 # but really it is not necessary
                 # TODO await response from https://github.com/eth-cscs/firecrest/issues/174
-                up_obj = client.external_upload(
-                    client_row.machine_name, remote_path.name, str(remote_path.parent)
+                up_obj = await in_client_thread(
+                    client,
+                    client.external_upload,
+                    machine,
+                    remote_path.name,
+                    str(remote_path.parent),
                 )
                 # Note, here we do not use pyfirecrest's finish_upload,
                 # since it simply runs a subprocess to do the upload (calling curl)
@@ -175,124 +336,314 @@ async def copy_to_remote(calc: CalcJob, ostore: ObjectStore) -> None:
                     # TODO this local fix for MACs was necessary for the demo
                     params["url"] = params["url"].replace("192.168.220.19", "localhost")
                 with ostore.open(key) as handle:
-                    await upload_io_to_url(handle, remote_path.name, params)
+                    await upload_io_to_url(
+                        handle, remote_path.name, params, session=session
+                    )
                 await poll_object_transfer(up_obj)
 
+    # upload files / make directories specified on the code and calcjob
+    items = [
+        (remote_folder.joinpath(*posixpath.split(rel_path)), key)
+        for rel_path, key in chain(
+            calc.code.upload_paths.items(), calc.upload_paths.items()
+        )
+    ]
+    # make each directory once (including the base remote folder),
+    # and only the deepest ones, since their parents are made with them
+    dirs = {remote_folder}
+    dirs.update(path for path, key in items if key is None)
+    dirs.update(path.parent for path, key in items if key is not None)
+    dirs.difference_update(*[path.parents for path in dirs])
+    await asyncio.gather(*[make_dir(path) for path in sorted(dirs)])
+    await asyncio.gather(
+        upload_script(),
+        *[upload(path, key) for path, key in items if key is not None],
+    )
+
 
-async def submit_on_remote(calc: CalcJob, ostore: ObjectStore) -> None:
+async def submit_on_remote(
+    calc: CalcJob,
+    ostore: ObjectStore,
+    *,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
+) -> None:
     """Run the calcjob on the compute resource."""
     client_row = calc.code.client
     script_path = calc.remote_path / Code.script_filename
     report(calc.pk, "submitting on remote")
     client = client_row.client
-    result = client.submit(client_row.machine_name, str(script_path), local_file=False)
+    result = await in_client_thread(
+        client,
+        client.submit,
+        client_row.machine_name,
+        str(script_path),
+        local_file=False,
+    )
     calc.process.job_id = result["jobid"]
 
 
 async def poll_until_finished(
-    calc: CalcJob, ostore: ObjectStore, *, interval: int = 1, timeout: int | None = None
+    calc: CalcJob,
+    ostore: ObjectStore,
+    *,
+    interval: float = 0.5,
+    max_interval: float = 30,
+    timeout: int | None = None,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
 ) -> None:
-    """Poll the compute resource until the calcjob is finished."""
+    """Poll the compute resource until the calcjob is finished.
+
+    The polling interval grows geometrically from ``interval`` up to ``max_interval``,
+    with some random jitter, and is reset whenever the job state changes.
+
+    :param poller: If given, wait on this (shared) poller instead
+    """
     report(calc.pk, "polling job until finished")
     client_row = calc.code.client
     client = client_row.client
+    machine = client_row.machine_name
+    job_id = calc.process.job_id
+    if poller is not None:
+        try:
+            await asyncio.wait_for(poller.wait(client, machine, job_id), timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("timeout waiting for calcjob to finish")
+        return
     start = time.time()
+    delay = interval
+    last_state = None
     while timeout is None or (time.time() - start) < timeout:
-        results = client.poll(client_row.machine_name, [calc.process.job_id])
-        if results and results[0]["state"] == "COMPLETED":
+        results = await in_client_thread(client, client.poll, machine, [job_id])
+        state = results[0]["state"] if results else None
+        if state == "COMPLETED":
             break
-        await asyncio.sleep(interval)
+        if state != last_state:
+            last_state = state
+            delay = interval
+        await asyncio.sleep(delay * random.uniform(1, 1 + POLL_JITTER))
+        delay = min(delay * POLL_BACKOFF, max_interval)
     else:
         raise RuntimeError("timeout waiting for calcjob to finish")
 
 
-async def copy_from_remote(calc: CalcJob, ostore: ObjectStore) -> None:
+class JobPoller:
+    """Poll remote jobs until they are finished, batching the jobs of each client.
+
+    Rather than every calcjob polling its own job,
+    a single background task makes one ``poll`` request per client and machine,
+    for all jobs currently being waited on.
+    """
+
+    def __init__(self, *, interval: float = 0.5, max_interval: float = 30) -> None:
+        """Initialize the poller.
+
+        The polling interval grows geometrically from ``interval`` up to ``max_interval``,
+        and is reset whenever a new job is waited on.
+        """
+        self._interval = interval
+        self._max_interval = max_interval
+        # (client, machine name) -> job id -> future, resolved once the job is finished
+        self._waiting: dict[
+            tuple[firecrest.Firecrest, str], dict[str, asyncio.Future[None]]
+        ] = {}
+        # created on first use, so that it is bound to the running event loop
+        self._added: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def wait(
+        self, client: firecrest.Firecrest, machine: str, job_id: Any
+    ) -> None:
+        """Wait until a job is finished."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault((client, machine), {})[str(job_id)] = future
+        if self._added is None:
+            self._added = asyncio.Event()
+        self._added.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self) -> None:
+        """Poll all waited on jobs, until there are none left."""
+        assert self._added is not None
+        delay = self._interval
+        while True:
+            self._added.clear()
+            for group, jobs in list(self._waiting.items()):
+                await self._poll(group, jobs)
+            if not self._waiting:
+                break
+            try:
+                await asyncio.wait_for(self._added.wait(), delay)
+                delay = self._interval
+            except asyncio.TimeoutError:
+                delay = min(delay * POLL_BACKOFF, self._max_interval)
+
+    async def _poll(
+        self,
+        group: tuple[firecrest.Firecrest, str],
+        jobs: dict[str, asyncio.Future[None]],
+    ) -> None:
+        """Poll a group of jobs, resolving the futures of those that are finished."""
+        for job_id in [j for j, future in jobs.items() if future.done()]:
+            del jobs[job_id]  # the waiter was cancelled
+        if jobs:
+            client, machine = group
+            # any failure, including a malformed response, is passed on to the waiters,
+            # rather than ending the polling task and leaving them unresolved
+            try:
+                results = await in_client_thread(
+                    client, client.poll, machine, list(jobs)
+                )
+                finished = [
+                    str(result["jobid"])
+                    for result in results
+                    if result["state"] == "COMPLETED"
+                ]
+            except Exception as exc:
+                for future in jobs.values():
+                    if not future.done():
+                        future.set_exception(exc)
+                jobs.clear()
+            else:
+                for job_id in finished:
+                    if job_id in jobs:
+                        future = jobs.pop(job_id)
+                        if not future.done():  # the waiter may have been cancelled
+                            future.set_result(None)
+        if not jobs:
+            del self._waiting[group]
+
+
+async def copy_from_remote(
+    calc: CalcJob,
+    ostore: ObjectStore,
+    *,
+    session: aiohttp.ClientSession | None = None,
+    poller: JobPoller | None = None,
+) -> None:
     """Copy the calcjob outputs from the compute resource."""
     client_row = calc.code.client
     remote_folder = calc.remote_path
     report(calc.pk, "downloading files from remote")
     client = client_row.client
-    vpath = RemotePath(client, client_row.machine_name, remote_folder, "d", 0)
+    machine = client_row.machine_name
+    # the job has finished, so directory listings can be shared between the globs
+    vpath = RemotePath(client, machine, remote_folder, "d", 0, listings={})
+    small_file_size = client_row.small_file_size_mb * 1024 * 1024
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    async def download(vsubpath: RemotePath) -> str | None:
+        """Download a single file to the object store, returning its key."""
+        async with semaphore:
+            small = vsubpath.size is not None and vsubpath.size <= small_file_size
+            # a small file is as cheap to download as its checksum is to request,
+            # and its key is computed whilst storing it anyway
+            checksum: str | None = (
+                None
+                if small
+                else await in_client_thread(
+                    client, client.checksum, machine, vsubpath.path
+                )
+            )
+            if checksum is not None and checksum in ostore:
+                return checksum
+            if small:
+                # the download is written straight to the store, not to a buffer
+                with ostore.open_for_write() as writer:
+                    await in_client_thread(
+                        client, client.simple_download, machine, vsubpath.path, writer
+                    )
+                return writer.key
+
+            down_obj = await in_client_thread(
+                client, client.external_download, machine, vsubpath.path
+            )
+            await poll_object_transfer(down_obj)
+
+            # here instead of using down_obj.finish_download
+            # we use an asynchoronous version of it
+            url = down_obj.object_storage_data
+
+            if os.environ.get("FIRECREST_LOCAL_TESTING"):
+                # TODO however the url above doesn't work locally, with the demo docker
+                # there was a fix already noted for MAC:url.replace("192.168.220.19", "localhost")
+                # however, this still gives a 403 error:
+                # "The request signature we calculated does not match the signature you provided.
+                # Check your key and signing method.""
+                # so for now, I'm just going to swap out the URL, with the actual location on disk
+                # where the files are stored for the demo!
+                from urllib.parse import urlparse
+
+                store_path = (
+                    "/Users/chrisjsewell/Documents/GitHub/firecrest/deploy/demo/minio"
+                    + urlparse(url).path
+                )
+                key: str | None = ostore.add_from_path(store_path)
+            else:
+                async with _use_session(session) as http:
+                    async with http.get(url) as resp:
+                        with ostore.open_for_write() as writer:
+                            async for chunk in resp.content.iter_chunked(
+                                DOWNLOAD_CHUNK_SIZE
+                            ):
+                                writer.write(chunk)
+                key = writer.key
+            if key != checksum:
+                raise RuntimeError(f"checksum mismatch for downloaded file: {vsubpath}")
+
+            # now invalidate the download object, since we no longer need it
+            await in_client_thread(client, down_obj.invalidate_object_storage_link)
+            return key
+
     # mapping of path to None (if directory) or file store key (if file)
     paths: dict[str, None | str] = {}
-    for download_glob in calc.download_globs:
-        # TODO clarify handling of symlinks
-        vsubpath: RemotePath
-        for vsubpath in vglob(vpath, download_glob, follow_symlinks=False):
-            save_path = str(vsubpath.pure_path.relative_to(remote_folder))
-            if save_path == Code.script_filename:
-                # never download the script file, since we can already generate it
-                # and so it would just be a waste of space
-                # (especially since they will all be different, if using the calcjob uuid)
-                continue
-            if vsubpath.is_symlink():
-                continue
-            elif vsubpath.is_dir():
-                paths[save_path] = None
-            elif vsubpath.is_file():
-                checksum = client.checksum(client_row.machine_name, vsubpath.path)
-                if checksum in ostore:
-                    paths[save_path] = checksum
-                elif (
-                    vsubpath.size is not None
-                    and vsubpath.size <= client_row.small_file_size_mb * 1024 * 1024
-                ):
-                    io = BytesIO()
-                    client.simple_download(client_row.machine_name, vsubpath.path, io)
-                    key = ostore.add_from_bytes(io.getvalue())
-                    if key != checksum:
-                        raise RuntimeError(
-                            f"checksum mismatch for downloaded file: {vsubpath}"
-                        )
-                    paths[save_path] = key
-                    await reliquish()
-                else:
-                    down_obj = client.external_download(
-                        client_row.machine_name, vsubpath.path
-                    )
-                    await poll_object_transfer(down_obj)
-
-                    # here instead of using down_obj.finish_download
-                    # we use an asynchoronous version of it
-                    url = down_obj.object_storage_data
-
-                    if os.environ.get("FIRECREST_LOCAL_TESTING"):
-                        # TODO however the url above doesn't work locally, with the demo docker
-                        # there was a fix already noted for MAC:url.replace("192.168.220.19", "localhost")
-                        # however, this still gives a 403 error:
-                        # "The request signature we calculated does not match the signature you provided.
-                        # Check your key and signing method.""
-                        # so for now, I'm just going to swap out the URL, with the actual location on disk
-                        # where the files are stored for the demo!
-                        from urllib.parse import urlparse
-
-                        store_path = (
-                            "/Users/chrisjsewell/Documents/GitHub/firecrest/deploy/demo/minio"
-                            + urlparse(url).path
-                        )
-                        key = ostore.add_from_path(store_path)
-                        if key != checksum:
-                            raise RuntimeError(
-                                f"checksum mismatch for downloaded file: {vsubpath}"
-                            )
-                        paths[save_path] = key
-                        await reliquish()
-                    else:
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(url) as resp:
-                                with ostore.open_for_write() as writer:
-                                    while True:
-                                        chunk = await resp.content.read(1024)
-                                        if not chunk:
-                                            break
-                                        writer.write(chunk)
-
-                    # now invalidate the download object, since we no longer need it
-                    down_obj.invalidate_object_storage_link()
+    # the files to download, in the order they were found
+    files: dict[str, RemotePath] = {}
+    download_globs = calc.download_globs
+
+    def find_paths() -> None:
+        """Walk the remote folder (making blocking requests), to find the paths."""
+        for download_glob in download_globs:
+            # TODO clarify handling of symlinks
+            vsubpath: RemotePath
+            for vsubpath in vglob(vpath, download_glob, follow_symlinks=False):
+                save_path = str(vsubpath.pure_path.relative_to(remote_folder))
+                if save_path == Code.script_filename:
+                    # never download the script file, since we can already generate it
+                    # and so it would just be a waste of space
+                    # (especially since they will all be different, if using the calcjob uuid)
+                    continue
+                if save_path in paths:
+                    continue  # already matched by a previous glob
+                if vsubpath.is_symlink():
+                    continue
+                elif vsubpath.is_dir():
+                    paths[save_path] = None
+                elif vsubpath.is_file():
+                    paths[save_path] = None  # placeholder, to keep the order
+                    files[save_path] = vsubpath
+
+    await in_client_thread(client, find_paths)
+
+    # download the files concurrently
+    keys = await asyncio.gather(*[download(vsubpath) for vsubpath in files.values()])
+    paths.update(zip(files, keys))
 
     calc.process.retrieved_paths = paths
 
 
+STEPS: dict[str, tuple[Callable[..., Awaitable[None]], ProcessSteps]] = {
+    "uploading": (copy_to_remote, "submitting"),
+    "submitting": (submit_on_remote, "running"),
+    "running": (poll_until_finished, "retrieving"),
+    "retrieving": (copy_from_remote, "finalised"),
+}
+"""Mapping of each process step to its task, and the step that follows it."""
+
+
 class UploadParameters(TypedDict):
     """Parameters for the calculation."""
 
@@ -304,17 +655,36 @@ class UploadParameters(TypedDict):
     params: dict[str, str]
 
 
+@asynccontextmanager
+async def _use_session(
+    session: aiohttp.ClientSession | None,
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Use the given HTTP session, or else a new one for the duration of the context."""
+    if session is not None:
+        yield session
+    else:
+        async with aiohttp.ClientSession() as new_session:
+            yield new_session
+
+
 async def upload_io_to_url(
-    handle: BinaryIO, filename: str, params: UploadParameters
+    handle: BinaryIO,
+    filename: str,
+    params: UploadParameters,
+    *,
+    session: aiohttp.ClientSession | None = None,
 ) -> str:
-    """Upload a file from a local file to a URL."""
+    """Upload a file from a local file to a URL.
+
+    :param session: The HTTP session to use, otherwise a new one is created
+    """
     # TODO assert params["method"] == "POST" and not params["json"] ?
-    async with aiohttp.ClientSession() as session:
+    async with _use_session(session) as http:
         form = aiohttp.FormData()
         form.add_field("file", handle, filename=filename)
         for key, value in params["data"].items():
             form.add_field(key, value)
-        async with session.post(
+        async with http.post(
             params["url"],
             data=form,
             headers=params["headers"],
@@ -3,7 +3,6 @@ from __future__ import annotations
 
 import logging
 from pathlib import Path
-from sqlite3 import Connection as SQLite3Connection
 import typing as t  # import t.Any, t.Iterable, Sequence, TypedDict, TypeVar
 
 import sqlalchemy as sa
@@ -11,6 +10,7 @@ from sqlalchemy import event
 from sqlalchemy import orm as sa_orm
 from sqlalchemy.exc import IntegrityError as SaIntegrityError
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.util import immutabledict
 
 from . import object_store as ostore
 from . import orm
@@ -21,14 +21,91 @@ LOGGER = logging.getLogger(__name__)
 ORM_TYPE = t.TypeVar("ORM_TYPE", bound=orm.Base)
 ANY_TYPE = t.TypeVar("ANY_TYPE")
 
+_WRITE_OPTIONS: immutabledict[str, t.Any] = immutabledict(
+    {"sqlite_begin_immediate": True}
+)
+"""The connection execution options, to begin a write transaction."""
+_SQLITE_WRITE_KEY = "fireflow_sqlite_write"
+"""The connection info key, recording if the current SQLite transaction can write."""
+_FLUSHED_KEY = "fireflow_flushed"
+"""The session info key, recording the last transaction that writes were flushed to."""
+
+_INVALID_ROW_ERRORS = (SaIntegrityError, sa.exc.StatementError, ValueError)
+"""The errors raised when flushing a row with invalid data
+(note ``OperationalError`` is also a ``StatementError``, but is not one of these)."""
+
+ITER_ROWS_BATCH_SIZE = 256
+"""The number of rows fetched from the database at a time, when iterating rows."""
+
+# statements which are used repeatedly are built once, at import,
+# so that the expression tree is not rebuilt on each call
+_UNFINISHED_STMT = (
+    sa.select(orm.Processing)
+    .where(orm.Processing.state == "playing")
+    .order_by(orm.Processing.pk)
+)
+_UNFINISHED_CORE_STMT = (
+    sa.select(orm.Processing.__table__)
+    .where(orm.Processing.__table__.c.state == "playing")
+    .order_by(orm.Processing.__table__.c.pk)
+)
+_TABLE_COUNTS_STMT = sa.select(
+    *(
+        sa.select(sa.func.count()).select_from(obj_cls).scalar_subquery()
+        for obj_cls in (orm.Client, orm.Code, orm.CalcJob)
+    )
+)
+_STATE_COUNTS_STMT = sa.select(orm.Processing.state, sa.func.count()).group_by(
+    orm.Processing.state
+)
+
+
+def _create_engine(url: str) -> sa.Engine:
+    """Create an SQLite engine, with the connection and transaction handling below.
+
+    The event listeners are registered on this engine only,
+    rather than on all engines created in the process.
+    """
+    engine = sa.create_engine(url)
+    event.listen(engine, "connect", _set_sqlite_pragma)
+    event.listen(engine, "begin", _sqlite_begin)
+    return engine
+
 
-@event.listens_for(sa.Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record) -> None:  # type: ignore
-    """Enable foreign key restrictions for SQLite."""
-    if isinstance(dbapi_connection, SQLite3Connection):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.close()
+    """Enable foreign key restrictions, and configure journalling, for SQLite.
+
+    Write-ahead logging allows reads to proceed whilst the calcjob processes
+    are updated, and (with ``synchronous=NORMAL``) commits only sync the log
+    at checkpoints, rather than on every transaction
+    (in-memory databases ignore the journal mode).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON;")
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.execute("PRAGMA synchronous=NORMAL;")
+    cursor.execute("PRAGMA temp_store=MEMORY;")
+    cursor.close()
+    # disable pysqlite's own (deferred) BEGIN handling, so that we emit it below
+    # see: https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+    dbapi_connection.isolation_level = None
+
+
+def _sqlite_begin(conn: sa.Connection) -> None:
+    """Emit the BEGIN for SQLite transactions.
+
+    Write transactions (see `Storage._begin_write`) use ``BEGIN IMMEDIATE``,
+    to acquire the write lock up-front, rather than upgrading the lock mid-transaction,
+    which can fail with ``SQLITE_BUSY`` when there are concurrent writers.
+    """
+    immediate = conn.get_execution_options().get("sqlite_begin_immediate", False)
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    conn.info[_SQLITE_WRITE_KEY] = immediate
+
+
+def _record_flush(session: sa_orm.Session, flush_context: t.Any) -> None:
+    """Record the transaction that the session flushed writes to."""
+    session.info[_FLUSHED_KEY] = session.get_transaction()
 
 
 class UnDeletableError(Exception):
@@ -41,7 +118,7 @@ class Storage:
     @classmethod
     def from_memory(cls) -> Storage:
         """Create an in-memory storage."""
-        engine = sa.create_engine("sqlite:///:memory:")
+        engine = _create_engine("sqlite:///:memory:")
         orm.Base.metadata.create_all(engine)
         return cls(engine, ostore.InMemoryObjectStore())
 
@@ -60,7 +137,7 @@ class Storage:
                 raise FileNotFoundError(f"Object store path not found: {object_path}")
             if not db_path.is_file():
                 raise FileNotFoundError(f"Database path not found: {db_path}")
-        engine = sa.create_engine(f"sqlite:///{db_path}")
+        engine = _create_engine(f"sqlite:///{db_path}")
         if init:
             object_path.mkdir(parents=True, exist_ok=True)
             orm.Base.metadata.create_all(engine)
@@ -76,8 +153,14 @@ class Storage:
     ) -> None:
         """Initialize the storage."""
 
-        self._session = sa_orm.sessionmaker(engine)()
+        # changes are only flushed by explicit writes (see `_begin_write`),
+        # never by (auto-begun) reads, since these would then hold the SQLite write lock
+        # (e.g. whilst the processes are awaiting the remote) until the next commit
+        self._session = sa_orm.sessionmaker(engine, autoflush=False)()
+        event.listen(self._session, "after_flush", _record_flush)
         self._object_store = object_store
+        # rows with updates, waiting to be committed (keyed by id, since rows are unhashable)
+        self._queued_updates: dict[int, orm.Base] = {}
 
     @property
     def objects(self) -> ostore.ObjectStore:
@@ -94,11 +177,11 @@ class Storage:
         # otherwise, `add` then `commit`, but we also need to ensure we rollback
         # note sqlachemy always executes queries in a transaction, and doesn't close it
         # (its automatically closed on commit)
-        if self._session.in_nested_transaction():
+        if not self._begin_write():
             self._session.add(obj)
             # without the flush, the pk is not set
             self._session.flush()
-        elif self._session.in_transaction():
+        else:
             # see
             # https://docs.sqlalchemy.org/en/20/orm/session_basics.html#framing-out-a-begin-commit-rollback-block
             try:
@@ -107,9 +190,35 @@ class Storage:
             except Exception:
                 self._session.rollback()
                 raise
-        else:
-            with self._session.begin():
-                self._session.add(obj)
+
+    def _begin_write(self) -> bool:
+        """Begin a write transaction, unless the caller has explicitly begun one.
+
+        For SQLite this emits ``BEGIN IMMEDIATE``.
+        A transaction that was only auto-begun (e.g. by an earlier read)
+        is ended and a new one begun,
+        without flushing or expiring the objects in the session.
+
+        :raises RuntimeError: if the auto-begun transaction has flushed writes,
+            since these would otherwise be silently committed (or discarded)
+        :return: Whether the transaction is owned by this call,
+            and so should be committed (or rolled back) by the caller
+        """
+        if self._session.in_nested_transaction():
+            return False
+        transaction = self._session.get_transaction()
+        if transaction is not None:
+            if transaction.origin is not sa_orm.SessionTransactionOrigin.AUTOBEGIN:
+                return False
+            if self._session.info.get(_FLUSHED_KEY) is transaction:
+                raise RuntimeError(
+                    "Cannot begin a write transaction, "
+                    "since the current transaction has uncommitted writes"
+                )
+            # the transaction has only read, so ending it discards nothing
+            transaction.close()
+        self._session.connection(execution_options=_WRITE_OPTIONS)
+        return True
 
     def _create_immutable_obj(self, obj: ORM_TYPE) -> ORM_TYPE:
         """Create an immutable object."""
@@ -126,6 +235,44 @@ class Storage:
         self._save_to_db(row)
         return self._create_immutable_obj(row)
 
+    def _save_rows(self, rows: t.Sequence[ORM_TYPE], name: str) -> None:
+        """Add multiple rows to a database table, within a nested transaction.
+
+        The rows are flushed together, so that the INSERTs can be batched,
+        rather than requiring a round-trip per row.
+
+        :raises ValueError: naming the index of the (first) invalid row
+        """
+        if not rows:
+            return
+        LOGGER.debug("Saving %s %s rows", len(rows), name)
+        try:
+            with self._session.begin_nested():
+                self._session.add_all(rows)
+        except sa.exc.OperationalError:
+            raise
+        except _INVALID_ROW_ERRORS as exc:
+            idx = self._find_invalid_row(rows)
+            raise ValueError(f"{name}[{idx}] item is invalid: {exc}") from exc
+        for row in rows:
+            self._create_immutable_obj(row)
+
+    def _find_invalid_row(self, rows: t.Sequence[orm.Base]) -> int | None:
+        """Find the index of the first row that fails to flush.
+
+        Each row is flushed in its own savepoint, so this is only used
+        to report which row made a batched flush fail.
+        """
+        for idx, row in enumerate(rows):
+            try:
+                with self._session.begin_nested():
+                    self._session.add(row)
+            except sa.exc.OperationalError:
+                raise  # e.g. the database is locked, which is not the row's fault
+            except _INVALID_ROW_ERRORS:
+                return idx
+        return None
+
     def _update_row(self, row: orm.Base) -> None:
         """Update a column of a row.
 
@@ -135,22 +282,61 @@ class Storage:
         # TODO better way to do this?
         self._save_to_db(row)
 
+    def _queue_update(self, row: orm.Base) -> None:
+        """Queue an update of a row, to be committed by `_flush_updates`.
+
+        This allows frequent updates (e.g. of processing states) to be batched
+        into a single transaction, rather than one commit per update.
+        """
+        self._queued_updates[id(row)] = row
+
+    def _flush_updates(self) -> None:
+        """Commit all queued row updates, in a single transaction."""
+        # skip rows with no changes to their (already persisted) state,
+        # so that no write transaction is started when nothing has changed;
+        # for modified rows, the session only updates the changed columns
+        rows = [
+            row
+            for row in self._queued_updates.values()
+            if row not in self._session or self._session.is_modified(row)
+        ]
+        self._queued_updates.clear()
+        if not rows:
+            return
+        LOGGER.debug("Updating %s rows", len(rows))
+        if not self._begin_write():
+            self._session.add_all(rows)
+            self._session.flush()
+            return
+        try:
+            self._session.add_all(rows)
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+
     def delete_row(self, obj: orm.Base) -> None:
         """Delete a row of a database table."""
         # TODO allow deleting by pk
         if obj.pk is None:
             raise ValueError(f"{obj} not saved")
         # TODO should the delete not be in the try/except?
+        owns_transaction = self._begin_write()
         self._session.delete(obj)
         try:
-            self._session.commit()
+            if owns_transaction:
+                self._session.commit()
+            else:
+                self._session.flush()
         except SaIntegrityError as exc:
-            self._session.rollback()
+            if owns_transaction:
+                self._session.rollback()
             raise UnDeletableError(
                 f"{obj} is likely a dependency for other objects"
             ) from exc
         except Exception:
-            self._session.rollback()
+            if owns_transaction:
+                self._session.rollback()
             raise
 
     def count_rows(
@@ -160,29 +346,50 @@ class Storage:
         where: None
         | sa.ColumnElement[bool]
         | t.Sequence[sa.ColumnElement[bool]] = None,
+        limit: int | None = None,
     ) -> int:
         """Count rows in a database table.
 
         :param obj_cls: The class of the table to select
         :param where: Additional filters to apply (sequence joined with AND)
+        :param limit: Stop counting once this many rows are found
         """
-        selector = sa.select(obj_cls)
-        selector = selector.order_by(obj_cls.pk)
-        if where is not None:
-            selector = selector.where(_create_filter(where))
+        # no ordering is needed to count, and it would add a redundant sort
+        selector = _select(obj_cls, where=where, order=False)
+        if limit is not None:
+            selector = selector.limit(limit)
         return self._session.execute(
             sa.select(sa.func.count()).select_from(selector.subquery())
         ).scalar_one()
 
+    def status_summary(self) -> StatusSummary:
+        """Count the rows of each table, and the processing rows in each state.
+
+        This requires only two queries, rather than one per count.
+        """
+        clients, codes, calcjobs = self._session.execute(_TABLE_COUNTS_STMT).one()
+        states: dict[str, int] = dict(
+            self._session.execute(_STATE_COUNTS_STMT).tuples().all()
+        )
+        return {
+            "clients": clients,
+            "codes": codes,
+            "calcjobs": calcjobs,
+            "states": states,
+        }
+
     def has_row(self, obj_cls: type[ORM_TYPE], pk: int) -> bool:
         """Check if a row exists in a database table.
 
         :param obj_cls: The class of the table to select
         :param pk: The primary key of the row to select
         """
-        selector = sa.select(obj_cls.pk)
-        selector = selector.where(obj_cls.pk == pk)
-        return self._session.execute(selector).scalar_one_or_none() is not None
+        # only ask the database if the pk exists,
+        # rather than loading (and materialising) any columns of the row
+        selector: sa.Select[tuple[int]] = sa.select(sa.literal(1, sa.Integer))
+        selector = selector.select_from(obj_cls)
+        selector = selector.where(obj_cls.pk == pk).limit(1)
+        return self._session.execute(selector).scalar() is not None
 
     def get_row(self, obj_cls: type[ORM_TYPE], pk: int) -> ORM_TYPE:
         """Get a row of a database table, represented by an ORM object.
@@ -215,6 +422,7 @@ class Storage:
         where: None
         | sa.ColumnElement[bool]
         | t.Sequence[sa.ColumnElement[bool]] = None,
+        eager: t.Sequence[str] | None = None,
     ) -> t.Iterable[ORM_TYPE]:
         """Iterate over rows of a database table, represented by ORM objects.
 
@@ -222,19 +430,59 @@ class Storage:
         :param page_size: The number of objects to select per page
         :param page_number: The page number to select
         :param where: Additional filters to apply (sequence joined with AND)
+        :param eager: Relationships to load in the same query,
+            as (dot delimited) attribute paths, e.g. ``"code.client"``,
+            rather than lazily loading them per row
         """
-        selector = sa.select(obj_cls)
-        selector = selector.order_by(obj_cls.pk)
+        selector = _select(obj_cls, where=where)
+        if eager:
+            selector = selector.options(*(_eager_load(obj_cls, p) for p in eager))
         if page_size is not None:
             selector = selector.limit(page_size).offset((page - 1) * page_size)
-        if where is not None:
-            selector = selector.where(_create_filter(where))
-        for obj in self._session.scalars(selector):
-            yield self._create_immutable_obj(obj)
+        # rows are fetched and converted in batches, rather than all up-front
+        selector = selector.execution_options(yield_per=ITER_ROWS_BATCH_SIZE)
+        for partition in self._session.scalars(selector).partitions():
+            for obj in partition:
+                yield self._create_immutable_obj(obj)
+
+    @t.overload
+    def get_unfinished(
+        self, limit: int | None = ..., *, core: t.Literal[False] = ...
+    ) -> list[orm.Processing]:
+        ...
+
+    @t.overload
+    def get_unfinished(
+        self, limit: int | None = ..., *, core: t.Literal[True]
+    ) -> list[sa.RowMapping]:
+        ...
+
+    def get_unfinished(
+        self, limit: int | None = None, *, core: bool = False
+    ) -> list[orm.Processing] | list[sa.RowMapping]:
+        """Get the processing rows of calcjobs that are still to be run.
+
+        :param limit: The maximum number of rows to return
+        :param core: Return read-only column mappings, rather than ORM objects
+            (this skips the ORM object construction and identity map)
+        """
+        if core:
+            core_stmt = (
+                _UNFINISHED_CORE_STMT
+                if limit is None
+                else _UNFINISHED_CORE_STMT.limit(limit)
+            )
+            return list(self._session.execute(core_stmt).mappings())
+        stmt = _UNFINISHED_STMT if limit is None else _UNFINISHED_STMT.limit(limit)
+        return [self._create_immutable_obj(obj) for obj in self._session.scalars(stmt)]
 
     def save_from_dict(self, data: FromDictConfig) -> dict[str, t.Any]:
         """Load data to the store from a dict representation.
 
+        Code labels are only unique per client, so a ``code_label`` may be ambiguous.
+        It then refers to the first matching code added by ``data``,
+        or else to the matching code already in the storage with the lowest pk.
+
         :return: A dict of data added to the storage
         """
         # TODO load as a jinja template, so we can use variables and do loops etc
@@ -277,25 +525,56 @@ class Storage:
                 )
 
         # add in single transaction? (so we can rollback if there's an error)
+        # rows are added one table at a time, with a single flush per table,
+        # so that the INSERTs are batched (retrieving the pks via RETURNING),
+        # and the pks of each level are then stitched into the foreign keys of the next
+        owns_transaction = self._begin_write()
+        try:
+            added_pks = self._save_from_dict(data, obj_label_to_key)
+        except Exception:
+            if owns_transaction:
+                self._session.rollback()
+            raise
+        if owns_transaction:
+            self._session.commit()
+        return added_pks
+
+    def _save_from_dict(
+        self, data: FromDictConfig, obj_label_to_key: dict[str, str]
+    ) -> dict[str, list[int]]:
+        """Add the clients, codes and calcjobs of ``data`` in a nested transaction."""
         with self._session.begin_nested():
 
             added_pks: dict[str, list[int]] = {}
 
-            for client_data in data.get("clients", []):
+            clients: list[orm.Client] = []
+            for idx, client_data in enumerate(data.get("clients", [])):
                 try:
-                    client = orm.Client(**client_data)
-                    self.save_row(client)
+                    clients.append(orm.Client(**client_data))
                 except Exception as exc:
                     raise ValueError(f"clients[{idx}] item is invalid: {exc}") from exc
-                added_pks.setdefault("clients", []).append(client.pk)
-
+            self._save_rows(clients, "clients")
+            client_label_to_pk = {client.label: client.pk for client in clients}
+            if clients:
+                added_pks["clients"] = [client.pk for client in clients]
+
+            codes: list[orm.Code] = []
+            # labels not added here are looked up in the database in a single query
+            client_label_to_pk.update(
+                self._get_pks_by_label(
+                    orm.Client,
+                    {
+                        code_data.get("client_label")
+                        for code_data in data.get("codes", [])
+                    }
+                    - client_label_to_pk.keys(),
+                )
+            )
             for idx, code_data in enumerate(data.get("codes", [])):
                 if "client_label" not in code_data:
                     raise ValueError(f"codes[{idx}] item has no 'client_label' key")
                 client_label = code_data.pop("client_label")
-                client_pk = self._session.scalar(
-                    sa.select(orm.Client.pk).where(orm.Client.label == client_label)
-                )
+                client_pk = client_label_to_pk.get(client_label)
                 if client_pk is None:
                     raise ValueError(
                         f"codes[{idx}]['client_label'] = {client_label!r} not found"
@@ -304,19 +583,33 @@ class Storage:
                     self.objects, code_data, obj_label_to_key, f"codes[{idx}]"
                 )
                 try:
-                    code = orm.Code(**code_data, client_pk=client_pk)
-                    self.save_row(code)
+                    codes.append(orm.Code(**code_data, client_pk=client_pk))
                 except Exception as exc:
                     raise ValueError(f"codes[{idx}] item is invalid: {exc}") from exc
-                added_pks.setdefault("codes", []).append(code.pk)
-
+            self._save_rows(codes, "codes")
+            # the first code added with a label takes precedence (see `save_from_dict`)
+            code_label_to_pk: dict[str, int] = {}
+            for code in codes:
+                code_label_to_pk.setdefault(code.label, code.pk)
+            if codes:
+                added_pks["codes"] = [code.pk for code in codes]
+
+            calcjobs: list[orm.CalcJob] = []
+            code_label_to_pk.update(
+                self._get_pks_by_label(
+                    orm.Code,
+                    {
+                        calcjob_data.get("code_label")
+                        for calcjob_data in data.get("calcjobs", [])
+                    }
+                    - code_label_to_pk.keys(),
+                )
+            )
             for idx, calcjob_data in enumerate(data.get("calcjobs", [])):
                 if "code_label" not in calcjob_data:
                     raise ValueError(f"calcjobs[{idx}] item has no 'code_label' key")
                 code_label = calcjob_data.pop("code_label")
-                code_pk = self._session.scalar(
-                    sa.select(orm.Code.pk).where(orm.Code.label == code_label)
-                )
+                code_pk = code_label_to_pk.get(code_label)
                 if code_pk is None:
                     raise ValueError(
                         f"calcjobs[{idx}]['code_label'] = {code_label!r} not found"
@@ -325,14 +618,34 @@ class Storage:
                     self.objects, calcjob_data, obj_label_to_key, f"calcjobs[{idx}]"
                 )
                 try:
-                    calcjob = orm.CalcJob(**calcjob_data, code_pk=code_pk)
-                    self.save_row(calcjob)
+                    calcjobs.append(orm.CalcJob(**calcjob_data, code_pk=code_pk))
                 except Exception as exc:
                     raise ValueError(f"calcjobs[{idx}] item is invalid: {exc}") from exc
-                added_pks.setdefault("calcjobs", []).append(calcjob.pk)
+            self._save_rows(calcjobs, "calcjobs")
+            if calcjobs:
+                added_pks["calcjobs"] = [calcjob.pk for calcjob in calcjobs]
 
         return added_pks
 
+    def _get_pks_by_label(
+        self, obj_cls: type[orm.Client] | type[orm.Code], labels: t.Iterable[t.Any]
+    ) -> dict[str, int]:
+        """Get a mapping of label to pk for the rows with the given labels.
+
+        If multiple rows have the same label, the lowest pk is used.
+        """
+        labels = [label for label in labels if isinstance(label, str)]
+        if not labels:
+            return {}
+        label_to_pk: dict[str, int] = {}
+        for label, pk in self._session.execute(
+            sa.select(obj_cls.label, obj_cls.pk)
+            .where(obj_cls.label.in_(labels))
+            .order_by(obj_cls.pk)
+        ):
+            label_to_pk.setdefault(label, pk)
+        return label_to_pk
+
 
 def _convert_upload_paths(
     store: ostore.ObjectStore,
@@ -380,6 +693,13 @@ class ObjectDictConfig(t.TypedDict, total=False):
     encoding: str
 
 
+class StatusSummary(t.TypedDict):
+    clients: int
+    codes: int
+    calcjobs: int
+    states: dict[str, int]
+
+
 class FromDictConfig(t.TypedDict, total=False):
     objects: dict[str, ObjectDictConfig]
     clients: list[dict[str, t.Any]]
@@ -387,6 +707,38 @@ class FromDictConfig(t.TypedDict, total=False):
     calcjobs: list[dict[str, t.Any]]
 
 
+def _select(
+    obj_cls: type[ORM_TYPE],
+    *,
+    where: None | sa.ColumnElement[bool] | t.Sequence[sa.ColumnElement[bool]] = None,
+    order: bool = True,
+) -> sa.Select[tuple[ORM_TYPE]]:
+    """Create a selector for rows of a database table.
+
+    :param obj_cls: The class of the table to select
+    :param where: Additional filters to apply (sequence joined with AND)
+    :param order: Whether to order the rows by primary key
+    """
+    selector = sa.select(obj_cls)
+    if order:
+        selector = selector.order_by(obj_cls.pk)
+    if where is not None:
+        selector = selector.where(_create_filter(where))
+    return selector
+
+
+def _eager_load(obj_cls: type[orm.Base], path: str) -> sa_orm.interfaces.LoaderOption:
+    """Create a loader option, to join the relationships of a (dot delimited) path."""
+    option: t.Any = None
+    for name in path.split("."):
+        attr = getattr(obj_cls, name)
+        option = sa_orm.joinedload(attr) if option is None else option.joinedload(attr)
+        obj_cls = attr.property.mapper.class_
+    if option is None:
+        raise ValueError(f"Empty relationship path: {path!r}")
+    return t.cast(sa_orm.interfaces.LoaderOption, option)
+
+
 def _create_filter(
     filters: sa.ColumnElement[bool] | t.Sequence[sa.ColumnElement[bool]],
 ) -> sa.ColumnElement[bool]:
@@ -0,0 +1,88 @@
+"""Tests for the object stores."""
+import hashlib
+import os
+
+import pytest
+
+from fireflow.object_store import FileObjectStore, InMemoryObjectStore
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryObjectStore()
+    return FileObjectStore(tmp_path)
+
+
+@pytest.mark.parametrize("content", [b"", b"content"])
+def test_add_and_open(store, content):
+    key = store.add_from_bytes(content)
+    assert key == hashlib.sha256(content).hexdigest()
+    assert key in store
+    assert store.get_size(key) == len(content)
+    with store.open(key) as handle:
+        assert handle.read() == content
+
+
+@pytest.mark.parametrize("chunks", [[], [b""], [b"a", b"", b"bc"]])
+def test_open_for_write(store, chunks):
+    with store.open_for_write() as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    assert writer.key == hashlib.sha256(b"".join(chunks)).hexdigest()
+    assert writer.key in store
+
+
+def test_missing_key(store):
+    key = hashlib.sha256(b"missing").hexdigest()
+    assert key not in store
+    with pytest.raises(KeyError):
+        store.get_size(key)
+    with pytest.raises(KeyError):
+        store.open(key)
+
+
+def test_file_store_fanout(tmp_path):
+    store = FileObjectStore(tmp_path)
+    key = store.add_from_bytes(b"content")
+    assert (tmp_path / key[:2] / key[2:]).read_bytes() == b"content"
+    assert list(store.keys()) == [key]
+    assert store.count() == 1
+
+
+def test_file_store_legacy_flat_layout(tmp_path):
+    """Objects stored directly in the store directory are still read."""
+    key = hashlib.sha256(b"legacy").hexdigest()
+    (tmp_path / key).write_bytes(b"legacy")
+    store = FileObjectStore(tmp_path)
+    assert key in store
+    assert store.get_size(key) == 6
+    with store.open(key) as handle:
+        assert handle.read() == b"legacy"
+    # adding the same content does not duplicate it in the fanout layout
+    assert store.add_from_bytes(b"legacy") == key
+    assert not (tmp_path / key[:2]).exists()
+    new_key = store.add_from_bytes(b"new")
+    assert sorted(store.keys()) == sorted([key, new_key])
+    assert store.count() == 2
+
+
+def test_file_store_invalidate(tmp_path):
+    """Cached knowledge of the store is only reset by `invalidate`."""
+    store = FileObjectStore(tmp_path)
+    key = store.add_from_bytes(b"content")
+    os.remove(tmp_path / key[:2] / key[2:])
+    assert key in store  # remembered as known
+    store.invalidate()
+    assert key not in store
+
+    # the absence of flat objects is also cached
+    legacy_key = hashlib.sha256(b"legacy").hexdigest()
+    assert legacy_key not in store
+    (tmp_path / legacy_key).write_bytes(b"legacy")
+    with pytest.raises(KeyError):
+        store.open(legacy_key)
+    store.invalidate()
+    assert legacy_key in store
+    with store.open(legacy_key) as handle:
+        assert handle.read() == b"legacy"
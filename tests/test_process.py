@@ -0,0 +1,238 @@
+"""Tests for running calcjobs."""
+import asyncio
+import copy
+import posixpath
+import sqlite3
+import time
+
+from fireflow import process as fprocess
+from fireflow.storage import Storage
+
+CONFIG = {
+    "clients": [
+        {
+            "label": "client",
+            "client_url": "http://localhost:8000",
+            "token_uri": "http://localhost:8080/token",
+            "client_id": "id",
+            "client_secret": "secret",
+            "machine_name": "cluster",
+            "work_dir": "/scratch",
+        }
+    ],
+    "codes": [{"client_label": "client", "label": "code", "script": "echo 1"}],
+    "calcjobs": [{"code_label": "code"}],
+}
+
+
+def test_concurrent_write_during_step(tmp_path, monkeypatch):
+    """Another connection can write whilst a step is in flight,
+    i.e. the runner does not hold the database write lock across awaits.
+    """
+    storage = Storage.from_path(tmp_path, init=True)
+    storage.save_from_dict(
+        {
+            **copy.deepcopy(CONFIG),
+            "calcjobs": [{"code_label": "code"} for _ in range(2)],
+        }
+    )
+    processing = storage.get_unfinished()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def upload(calc, ostore, **kwargs):
+        # the first calcjob is still uploading when the second's update is committed
+        await asyncio.sleep(0.1 if calc.pk == 1 else 0)
+
+    async def submit(calc, ostore, **kwargs):
+        if calc.pk == 1:
+            started.set()
+        await release.wait()
+
+    monkeypatch.setitem(fprocess.STEPS, "uploading", (upload, "submitting"))
+    monkeypatch.setitem(fprocess.STEPS, "submitting", (submit, "finalised"))
+
+    async def main():
+        task = asyncio.create_task(
+            fprocess.run_multiple_calcjobs(processing, storage, flush_interval=0.02)
+        )
+        await started.wait()
+        await asyncio.sleep(0.1)  # allow the periodic flush to run
+        conn = sqlite3.connect(tmp_path / "storage.sqlite", timeout=0)
+        try:
+            with conn:
+                conn.execute("UPDATE client SET work_dir = '/other'")
+        finally:
+            conn.close()
+        release.set()
+        await task
+
+    asyncio.run(main())
+    assert Storage.from_path(tmp_path).get_unfinished() == []
+
+
+class FakePollClient:
+    """A client whose ``poll`` returns the current state of the known jobs."""
+
+    def __init__(self, states):
+        self.states = states
+        self.calls = []
+
+    def poll(self, machine, jobs):
+        self.calls.append(list(jobs))
+        return [
+            {"jobid": job_id, "state": self.states[job_id]}
+            for job_id in jobs
+            if job_id in self.states
+        ]
+
+
+def test_job_poller_fan_out():
+    """The waiting jobs are polled in one request per client,
+    and each waiter is resolved once its job has completed.
+    """
+    client = FakePollClient({"1": "COMPLETED", "2": "RUNNING", "3": "RUNNING"})
+    other = FakePollClient({"4": "COMPLETED"})
+    poller = fprocess.JobPoller(interval=0.01, max_interval=0.02)
+
+    async def main():
+        waiters = [
+            asyncio.create_task(poller.wait(client, "cluster", job_id))
+            for job_id in (1, 2, 3)
+        ]
+        waiters.append(asyncio.create_task(poller.wait(other, "cluster", 4)))
+        await asyncio.wait_for(waiters[0], 5)
+        await asyncio.sleep(0.05)
+        assert [waiter.done() for waiter in waiters] == [True, False, False, True]
+        client.states.update({"2": "COMPLETED", "3": "COMPLETED"})
+        await asyncio.wait_for(asyncio.gather(*waiters), 5)
+
+    asyncio.run(main())
+    assert client.calls[0] == ["1", "2", "3"]
+    assert len(client.calls) > 2
+    assert all(call == ["2", "3"] for call in client.calls[1:])
+    assert other.calls == [["4"]]
+    assert poller._waiting == {}
+
+
+def test_job_poller_cancel():
+    """A cancelled waiter stops its job being polled,
+    and the polling task ends once no jobs are waited on.
+    """
+    client = FakePollClient({"1": "RUNNING", "2": "RUNNING"})
+    poller = fprocess.JobPoller(interval=0.01, max_interval=0.02)
+
+    async def main():
+        first = asyncio.create_task(poller.wait(client, "cluster", 1))
+        second = asyncio.create_task(poller.wait(client, "cluster", 2))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        assert client.calls[-1] == ["2"]
+        client.states["2"] = "COMPLETED"
+        await asyncio.wait_for(second, 5)
+        assert first.cancelled()
+        assert poller._task is not None
+        await asyncio.wait_for(poller._task, 5)
+
+    asyncio.run(main())
+    assert client.calls[0] == ["1", "2"]
+    assert poller._waiting == {}
+
+
+def test_job_poller_malformed_result():
+    """An error parsing the poll results is raised for each waiting job."""
+
+    class MalformedClient:
+        def poll(self, machine, jobs):
+            return [{"state": "COMPLETED"}]
+
+    client = MalformedClient()
+    poller = fprocess.JobPoller(interval=0.01)
+
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                poller.wait(client, "cluster", 1),
+                poller.wait(client, "cluster", 2),
+                return_exceptions=True,
+            ),
+            5,
+        )
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [KeyError, KeyError]
+
+
+def test_client_calls_serialized():
+    """Blocking calls are serialized per client, but not across clients."""
+
+    class Client:
+        def __init__(self):
+            self.active = self.max_active = 0
+
+        def request(self):
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            self.active -= 1
+
+    clients = [Client(), Client()]
+
+    async def main():
+        start = time.monotonic()
+        await asyncio.gather(
+            *[
+                fprocess.in_client_thread(client, client.request)
+                for client in clients
+                for _ in range(3)
+            ]
+        )
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(main())
+    assert [client.max_active for client in clients] == [1, 1]
+    assert elapsed < 0.25  # i.e. not 6 * 0.05
+
+
+class FakeRemoteClient:
+    """A client serving the files of a remote folder."""
+
+    def __init__(self, folder, files):
+        self.folder = folder
+        self.files = files
+
+    def list_files(self, machine, path, show_hidden=True):
+        assert path == self.folder
+        return [
+            {"name": name, "type": "-", "size": str(len(content))}
+            for name, content in self.files.items()
+        ]
+
+    def simple_download(self, machine, path, writer):
+        writer.write(self.files[posixpath.basename(path)])
+
+
+def test_copy_from_remote_empty_file():
+    """An empty output file is stored as an (empty) object, not as a directory."""
+    storage = Storage.from_memory()
+    storage.save_from_dict(
+        {
+            **copy.deepcopy(CONFIG),
+            "calcjobs": [{"code_label": "code", "download_globs": ["*.txt"]}],
+        }
+    )
+    processing = storage.get_unfinished()[0]
+    processing._freeze(False)
+    calc = processing.calcjob
+    files = {"empty.txt": b"", "out.txt": b"output"}
+    calc.code.client._client = FakeRemoteClient(str(calc.remote_path), files)
+
+    asyncio.run(fprocess.copy_from_remote(calc, storage.objects))
+
+    paths = processing.retrieved_paths
+    assert set(paths) == set(files)
+    for name, content in files.items():
+        assert paths[name] is not None
+        with storage.objects.open(paths[name]) as handle:
+            assert handle.read() == content
@@ -0,0 +1,115 @@
+"""Tests for parsing filter strings to SQL."""
+import pytest
+
+from fireflow import orm
+from fireflow._sql_parse import FilterStringError, _parse_filter_ast, filter_from_string
+
+
+def _to_sql(filter_string: str) -> "str | None":
+    expr = filter_from_string(orm.Code, filter_string)
+    if expr is None:
+        return None
+    return str(expr.compile(compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.parametrize(
+    "filter_string,expected",
+    [
+        # comparisons, including the SQL aliases of == and !=
+        ("pk == 1", "code.pk = 1"),
+        ("pk = 1", "code.pk = 1"),
+        ("pk != 1", "code.pk != 1"),
+        ("pk <> 1", "code.pk != 1"),
+        ("pk >= 1.5", "code.pk >= 1.5"),
+        ("pk == -1", "code.pk = -1"),
+        ("label LIKE 'a%'", "code.label LIKE 'a%'"),
+        ("label NOT LIKE 'a%'", "code.label NOT LIKE 'a%'"),
+        ("pk IN (1, 2)", "code.pk IN (1, 2)"),
+        ("pk NOT IN (1, 2)", "(code.pk NOT IN (1, 2))"),
+        ("label IS NULL", "code.label IS NULL"),
+        ("label IS NOT NULL", "code.label IS NOT NULL"),
+        # quoting and case
+        ("label == 'it''s'", "code.label = 'it''s'"),
+        ("\"label\" == 'a'", "code.label = 'a'"),
+        ("PK == 1", "code.pk = 1"),
+        ("pk in (1) and label like 'x'", "code.pk IN (1) AND code.label LIKE 'x'"),
+        ("pk == 1 -- comment", "code.pk = 1"),
+        # precedence
+        (
+            "pk == 1 AND label == 'a' OR pk == 2",
+            "code.pk = 1 AND code.label = 'a' OR code.pk = 2",
+        ),
+        (
+            "pk == 1 OR label == 'a' AND pk == 2",
+            "code.pk = 1 OR code.label = 'a' AND code.pk = 2",
+        ),
+        (
+            "pk == 1 AND (label == 'a' OR pk == 2)",
+            "code.pk = 1 AND (code.label = 'a' OR code.pk = 2)",
+        ),
+        (
+            "pk == 1 AND pk == 2 AND pk == 3",
+            "code.pk = 1 AND code.pk = 2 AND code.pk = 3",
+        ),
+        ("NOT pk == 1", "code.pk != 1"),
+        ("NOT pk == 1 AND pk == 2", "code.pk != 1 AND code.pk = 2"),
+        ("NOT (pk == 1 OR pk == 2)", "NOT (code.pk = 1 OR code.pk = 2)"),
+        # no filter
+        ("", None),
+        ("label", None),
+    ],
+)
+def test_filter_to_sql(filter_string, expected):
+    assert _to_sql(filter_string) == expected
+
+
+@pytest.mark.parametrize(
+    "filter_string,expected",
+    [
+        (
+            "a + 1 * 2 == 3",
+            ("==", ("+", ("COLUMN", None, "a"), ("*", 1, 2)), 3),
+        ),
+        (
+            "a < 1 == b < 2",
+            ("==", ("<", ("COLUMN", None, "a"), 1), ("<", ("COLUMN", None, "b"), 2)),
+        ),
+        ("a == 1e3", ("==", ("COLUMN", None, "a"), 1000.0)),
+        ("a == TRUE", ("==", ("COLUMN", None, "a"), True)),
+        ("t.a == 1", ("==", ("COLUMN", "t", "a"), 1)),
+    ],
+)
+def test_parse_ast(filter_string, expected):
+    assert _parse_filter_ast(filter_string) == expected
+
+
+@pytest.mark.parametrize(
+    "filter_string",
+    ["pk == 1", "pk = 'a'", "label <> NULL", "label != 'it''s'"],
+)
+def test_simple_comparison_matches_parser(filter_string):
+    """The fast path for simple comparisons gives the same AST as the full parser."""
+    assert _parse_filter_ast(filter_string) == _parse_filter_ast(f"({filter_string})")
+
+
+@pytest.mark.parametrize(
+    "filter_string,user,detail",
+    [
+        ("pk ==", "Could not be read", "Unexpected end of expression"),
+        ("pk == 1 label", "Could not be read", "Unexpected 'label'"),
+        ("(pk == 1", "Could not be read", "Expected ')'"),
+        ("pk $ 1", "Could not be read", "Unexpected character '$'"),
+        ("unknown == 1", "Unknown column 'unknown'", "not found"),
+        ("pk == label", "unknown right comparison", "Got a column"),
+        ("pk IN (label)", "unknown right comparison", "Got a column"),
+        ("pk == (1 + 2)", "unknown right comparison", "Got an expression"),
+        ("1 == pk", "Left comparators must be columns", "Expected a column"),
+        ("t.pk == 1", "Unknown table: t", ""),
+        ("pk + 1", "Unknown comparator: +", ""),
+    ],
+)
+def test_filter_errors(filter_string, user, detail):
+    with pytest.raises(FilterStringError) as exc_info:
+        filter_from_string(orm.Code, filter_string)
+    assert exc_info.value.user == user
+    assert detail in exc_info.value.detail
@@ -0,0 +1,135 @@
+"""Tests for the storage."""
+import sqlite3
+
+import pytest
+
+from fireflow import orm
+from fireflow.storage import Storage
+
+CLIENT = {
+    "client_url": "http://localhost:8000",
+    "token_uri": "http://localhost:8080/token",
+    "client_id": "id",
+    "client_secret": "secret",
+    "machine_name": "cluster",
+    "work_dir": "/scratch",
+}
+
+
+def _code_of_calcjob(storage, pk):
+    return storage.get_column(orm.CalcJob.code_pk, pk)
+
+
+def test_save_from_dict_code_label_precedence():
+    """Ambiguous code labels refer to the first code added in the same dict,
+    else to the existing code with the lowest pk.
+    """
+    storage = Storage.from_memory()
+    storage.save_from_dict(
+        {
+            "clients": [{"label": "a", **CLIENT}, {"label": "b", **CLIENT}],
+            "codes": [
+                {"client_label": "a", "label": "code", "script": "echo a"},
+                {"client_label": "b", "label": "code", "script": "echo b"},
+            ],
+            "calcjobs": [{"code_label": "code"}],
+        }
+    )
+    assert _code_of_calcjob(storage, 1) == 1
+    added = storage.save_from_dict(
+        {
+            "clients": [{"label": "c", **CLIENT}],
+            "codes": [{"client_label": "c", "label": "code", "script": "echo c"}],
+            "calcjobs": [{"code_label": "code"}],
+        }
+    )
+    assert _code_of_calcjob(storage, added["calcjobs"][0]) == added["codes"][0]
+    added = storage.save_from_dict({"calcjobs": [{"code_label": "code"}]})
+    assert _code_of_calcjob(storage, added["calcjobs"][0]) == 1
+
+
+@pytest.mark.parametrize(
+    "data,message",
+    [
+        (
+            {"clients": [{"label": "b", **CLIENT}, {"label": "a", **CLIENT}]},
+            "clients[1] item is invalid",
+        ),
+        (
+            {"clients": [{"label": "b", **CLIENT}, {"label": "b", **CLIENT}]},
+            "clients[1] item is invalid",
+        ),
+        (
+            {
+                "codes": [
+                    {"client_label": "a", "label": "x", "script": "echo"},
+                    {"client_label": "a", "label": "x", "script": "echo"},
+                ]
+            },
+            "codes[1] item is invalid",
+        ),
+        (
+            {"codes": [{"client_label": "missing", "label": "x", "script": "echo"}]},
+            "codes[0]['client_label'] = 'missing' not found",
+        ),
+        (
+            {"calcjobs": [{"code_label": "missing"}]},
+            "calcjobs[0]['code_label'] = 'missing' not found",
+        ),
+    ],
+)
+def test_save_from_dict_errors(data, message):
+    """The index of the invalid item is reported, and nothing is added."""
+    storage = Storage.from_memory()
+    storage.save_from_dict({"clients": [{"label": "a", **CLIENT}]})
+    with pytest.raises(ValueError) as exc_info:
+        storage.save_from_dict(data)
+    assert str(exc_info.value).startswith(message)
+    assert storage.status_summary()["clients"] == 1
+    assert storage.status_summary()["codes"] == 0
+
+
+def test_flush_updates_releases_write_lock(tmp_path):
+    """Queued updates are committed by `_flush_updates`,
+    after which other connections can write,
+    even if the rows are read (and lazily loaded) in between.
+    """
+    storage = Storage.from_path(tmp_path, init=True)
+    storage.save_from_dict(
+        {
+            "clients": [{"label": "a", **CLIENT}],
+            "codes": [{"client_label": "a", "label": "x", "script": "echo"}],
+            "calcjobs": [{"code_label": "x"}, {"code_label": "x"}],
+        }
+    )
+    first, second = storage.get_unfinished()
+    first._freeze(False)
+    second._freeze(False)
+
+    def write_other():
+        conn = sqlite3.connect(tmp_path / "storage.sqlite", timeout=0)
+        try:
+            with conn:
+                conn.execute("UPDATE client SET work_dir = '/other'")
+        finally:
+            conn.close()
+
+    first.step = "uploading"
+    storage._queue_update(first)
+    storage._flush_updates()
+    # modify a row after the commit, then lazily load the (expired) rows
+    second.step = "uploading"
+    storage._queue_update(second)
+    assert second.calcjob.code.client.label == "a"
+    write_other()
+    storage._flush_updates()
+    write_other()
+
+    assert [p.step for p in Storage.from_path(tmp_path).get_unfinished()] == [
+        "uploading",
+        "uploading",
+    ]
+    # nothing is written if the queued rows are unchanged
+    storage._queue_update(first)
+    storage._flush_updates()
+    assert not storage._session.in_transaction()